@@ -0,0 +1,249 @@
+"""Движок рассылок: пул параллельных отправителей."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterable, Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import lru_cache
+from typing import Any
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.bot.outbound import Priority, set_outbound_priority
+from app.config import get_settings
+from app.db import crud
+
+logger = logging.getLogger(__name__)
+
+SendFunc = Callable[[int], Awaitable[Any]]
+DeliveredHook = Callable[[int], Awaitable[None]]
+FailedHook = Callable[[int, "Outcome"], Awaitable[None]]
+
+
+class Outcome(Enum):
+    SENT = "sent"
+    FAILED = "failed"
+    UNREACHABLE = "unreachable"  # Бот заблокирован или чата больше нет
+
+
+# Ответы 400, после которых писать в чат бессмысленно
+_UNREACHABLE_MARKERS = ("chat not found", "user is deactivated", "bot was kicked", "peer_id_invalid")
+
+
+def classify_error(error: Exception) -> Outcome:
+    if isinstance(error, TelegramForbiddenError):
+        return Outcome.UNREACHABLE
+    if isinstance(error, TelegramBadRequest) and any(
+        marker in error.message.lower() for marker in _UNREACHABLE_MARKERS
+    ):
+        return Outcome.UNREACHABLE
+    return Outcome.FAILED
+
+
+@dataclass
+class BroadcastResult:
+    sent: int = 0
+    failed: int = 0
+    unreachable: list[int] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return self.sent + self.failed
+
+
+@dataclass
+class BroadcastProgress:
+    """Живые счётчики задания для публикации прогресса."""
+
+    total: int
+    sent: int = 0
+    failed: int = 0
+    _last_processed: int = 0
+    _last_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def remaining(self) -> int:
+        return max(self.total - self.sent - self.failed, 0)
+
+    def snapshot(self) -> dict[str, float]:
+        """Счётчики и скорость (сообщений/с) с момента прошлого снимка."""
+        now = time.monotonic()
+        processed = self.sent + self.failed
+        elapsed = now - self._last_at
+        rate = (processed - self._last_processed) / elapsed if elapsed > 0 else 0.0
+        self._last_processed, self._last_at = processed, now
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "remaining": self.remaining,
+            "rate": round(rate, 1),
+        }
+
+
+async def _iterate(chat_ids: Iterable[int] | AsyncIterable[int]):
+    if isinstance(chat_ids, AsyncIterable):
+        async for chat_id in chat_ids:
+            yield chat_id
+    else:
+        for chat_id in chat_ids:
+            yield chat_id
+
+
+class BroadcastEngine:
+    """Рассылка через пул параллельных отправителей.
+
+    Скорость ограничивает общий планировщик исходящих сообщений
+    (app.bot.outbound) с приоритетом BULK, поэтому пропускная способность
+    упирается в лимит Telegram, а не в сетевую задержку одного запроса,
+    и ответы пользователям во время рассылки не ждут в очереди.
+    """
+
+    def __init__(self, concurrency: int, max_retries: int = 3) -> None:
+        self.concurrency = max(concurrency, 1)
+        self.max_retries = max_retries
+
+    async def run(
+        self,
+        chat_ids: Iterable[int] | AsyncIterable[int],
+        send: SendFunc,
+        on_delivered: DeliveredHook | None = None,
+        progress: BroadcastProgress | None = None,
+        should_stop: Callable[[], bool] | None = None,
+        on_failed: FailedHook | None = None,
+    ) -> BroadcastResult:
+        """Отправить сообщение во все чаты. `send` вызывается с chat_id.
+
+        Когда `should_stop()` возвращает True, новые отправки не начинаются:
+        дожидаемся только уже идущих. `on_delivered` / `on_failed` вызываются
+        по каждому чату сразу, поэтому итог известен и при отмене run().
+        """
+        result = BroadcastResult()
+        queue: asyncio.Queue[int | None] = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker() -> None:
+            set_outbound_priority(Priority.BULK)
+            while True:
+                chat_id = await queue.get()
+                if chat_id is None:
+                    return
+                if should_stop and should_stop():
+                    continue  # Не начинаем: вызывающий вернёт chat_id в очередь задания
+                outcome = await self._deliver(chat_id, send)
+                if outcome is Outcome.SENT:
+                    result.sent += 1
+                    if progress:
+                        progress.sent += 1
+                    if on_delivered:
+                        await on_delivered(chat_id)
+                else:
+                    result.failed += 1
+                    if progress:
+                        progress.failed += 1
+                    if outcome is Outcome.UNREACHABLE:
+                        result.unreachable.append(chat_id)
+                    if on_failed:
+                        await on_failed(chat_id, outcome)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            async for chat_id in _iterate(chat_ids):
+                if should_stop and should_stop():
+                    break
+                await queue.put(chat_id)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+        return result
+
+    async def _deliver(self, chat_id: int, send: SendFunc) -> Outcome:
+        for _ in range(self.max_retries + 1):
+            try:
+                await send(chat_id)
+            except TelegramRetryAfter as e:
+                # Планировщик уже приостановил все отправки; повторяем после паузы
+                logger.warning(f"Flood control on chat {chat_id}, retry in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                outcome = classify_error(e)
+                if outcome is Outcome.UNREACHABLE:
+                    logger.info(f"Chat {chat_id} is unreachable: {e}")
+                else:
+                    logger.error(f"Failed to send to {chat_id}: {e}")
+                return outcome
+            return Outcome.SENT
+        logger.error(f"Failed to send to {chat_id}: retry limit exceeded")
+        return Outcome.FAILED
+
+
+class DeliveryRecorder:
+    """Буфер успешных доставок: last_mailed_at пишется одним UPDATE на пачку.
+
+    Сброс происходит каждые `batch_size` доставок или раз в `interval_ms`,
+    а также при выходе из контекста. Каждый сброс открывает свою сессию.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        batch_size: int | None = None,
+        interval_ms: int | None = None,
+    ) -> None:
+        settings = get_settings()
+        self._session_factory = session_factory
+        self.batch_size = batch_size or settings.broadcast_flush_size
+        self.interval = (interval_ms or settings.broadcast_flush_interval_ms) / 1000
+        self._pending: list[int] = []
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> DeliveryRecorder:
+        self._task = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def add(self, chat_id: int) -> None:
+        self._pending.append(chat_id)
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            telegram_ids, self._pending = self._pending, []
+            try:
+                async with self._session_factory() as session:
+                    await crud.mark_mailed(session, telegram_ids)
+            except Exception as e:
+                logger.error(f"Failed to update last_mailed_at for {len(telegram_ids)} subscribers: {e}")
+            except BaseException:
+                # Отмена периодического сброса на выходе: пачку запишет финальный flush
+                self._pending = telegram_ids + self._pending
+                raise
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+
+@lru_cache(maxsize=1)
+def get_broadcast_engine() -> BroadcastEngine:
+    """Общий для процесса движок рассылок."""
+    settings = get_settings()
+    return BroadcastEngine(concurrency=settings.broadcast_concurrency)
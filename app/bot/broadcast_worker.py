@@ -0,0 +1,280 @@
+"""Фоновый воркер заданий рассылки с контрольными точками.
+
+Задание обрабатывается порциями подписчиков (keyset по Subscriber.id).
+Перед отправкой порции доставки записываются в broadcast_deliveries, после —
+сохраняются их статусы и курсор задания. После падения процесса задание
+подхватывается заново с сохранённого курсора, а уже записанные доставки
+пропускаются, поэтому повторной отправки никому не будет. При штатной
+остановке новые отправки не начинаются, итог уже отправленных сохраняется,
+а резерв на не начатые снимается — после возобновления они будут отправлены.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+
+from aiogram import Bot
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.bot.broadcast import BroadcastProgress, DeliveryRecorder, Outcome, SendFunc, get_broadcast_engine
+from app.bot.media_cache import CachedPhoto
+from app.bot.outbound import Priority, outbound_priority
+from app.config import get_settings
+from app.db import crud
+from app.db.models import BroadcastJob
+
+logger = logging.getLogger(__name__)
+
+ProgressListener = Callable[[dict], Awaitable[None]]
+
+# Прогресс публикуется агрегированно, не чаще раза в 500 мс
+PROGRESS_INTERVAL = 0.5
+
+_worker: BroadcastWorker | None = None
+
+
+class BroadcastWorker:
+    def __init__(
+        self,
+        bot: Bot,
+        session_factory: async_sessionmaker,
+        poll_interval: float = 5.0,
+        on_progress: ProgressListener | None = None,
+    ) -> None:
+        settings = get_settings()
+        self.bot = bot
+        self.session_factory = session_factory
+        self.on_progress = on_progress
+        self.chunk_size = settings.broadcast_chunk_size
+        self.stale_after = timedelta(seconds=settings.broadcast_job_stale_after)
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"[:64]
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Дождаться уже идущих отправок, сохранить итог и вернуть задание в очередь."""
+        if not self._task:
+            return
+        self._stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                async with self.session_factory() as session:
+                    job = await crud.claim_broadcast_job(session, self.worker_id, self.stale_after)
+                if job:
+                    await self.process(job)
+                    continue
+            except Exception as e:
+                logger.error(f"Broadcast worker error: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def process(self, job: BroadcastJob) -> None:
+        """Выполнить взятое задание до конца (или до остановки воркера)."""
+        logger.info(f"Broadcast job #{job.id}: processing from cursor {job.cursor}")
+        send = self._make_sender(job)
+        progress = BroadcastProgress(total=job.total, sent=job.sent, failed=job.failed)
+        reporter = asyncio.create_task(self._report_progress(job.id, progress))
+        try:
+            completed = await self._process_chunks(job, send, progress)
+        finally:
+            reporter.cancel()
+            await asyncio.gather(reporter, return_exceptions=True)
+        if not completed:
+            return
+
+        async with self.session_factory() as session:
+            finished = await crud.finish_broadcast_job(session, job.id)
+        if finished:
+            logger.info(f"Broadcast job #{job.id} done: sent={finished.sent} failed={finished.failed}")
+            progress.total = progress.sent + progress.failed
+            await self._publish(job.id, "done", progress)
+            await self._report(finished)
+
+    async def _process_chunks(self, job: BroadcastJob, send: SendFunc, progress: BroadcastProgress) -> bool:
+        """Разослать все порции. False — воркер остановлен, задание возвращено в очередь."""
+        cursor = job.cursor
+        async with self.session_factory() as read_session, DeliveryRecorder(self.session_factory) as recorder:
+            async for chunk in crud.iter_active_subscribers(read_session, self.chunk_size, after_id=cursor):
+                if self._stopping:
+                    await self._release(job.id, cursor)
+                    return False
+
+                async with self.session_factory() as session:
+                    pending = await crud.reserve_deliveries(session, job.id, [tid for _, tid in chunk])
+
+                attempted: set[int] = set()
+                sent: list[int] = []
+                failed: list[int] = []
+                unreachable: list[int] = []
+
+                async def send_tracked(chat_id: int) -> None:
+                    attempted.add(chat_id)
+                    await send(chat_id)
+
+                async def on_delivered(chat_id: int) -> None:
+                    sent.append(chat_id)
+                    await recorder.add(chat_id)
+
+                async def on_failed(chat_id: int, outcome: Outcome) -> None:
+                    failed.append(chat_id)
+                    if outcome is Outcome.UNREACHABLE:
+                        unreachable.append(chat_id)
+
+                try:
+                    await get_broadcast_engine().run(
+                        pending,
+                        send_tracked,
+                        on_delivered=on_delivered,
+                        progress=progress,
+                        should_stop=lambda: self._stopping,
+                        on_failed=on_failed,
+                    )
+                except asyncio.CancelledError:
+                    # stop() не дождался: прерванные отправки остаются pending (могли уйти)
+                    unsent = [chat_id for chat_id in pending if chat_id not in attempted]
+                    await asyncio.shield(self._release(job.id, cursor, sent, failed, unsent, unreachable))
+                    raise
+
+                unsent = [chat_id for chat_id in pending if chat_id not in attempted]
+                if unsent:
+                    # Остановка посреди порции: курсор остаётся перед ней
+                    await self._release(job.id, cursor, sent, failed, unsent, unreachable)
+                    return False
+
+                cursor = chunk[-1][0]
+                async with self.session_factory() as session:
+                    await crud.checkpoint_broadcast_job(session, job.id, cursor, sent, failed)
+                    # Заблокировавшие бота больше не попадут в рассылки
+                    await crud.deactivate_subscribers(session, unreachable)
+        return True
+
+    async def _release(
+        self,
+        job_id: int,
+        cursor: int,
+        sent: list[int] | None = None,
+        failed: list[int] | None = None,
+        unsent: list[int] | None = None,
+        unreachable: list[int] | None = None,
+    ) -> None:
+        """Сохранить итог начатых отправок и вернуть задание в очередь."""
+        async with self.session_factory() as session:
+            await crud.checkpoint_broadcast_job(session, job_id, cursor, sent or [], failed or [])
+            await crud.deactivate_subscribers(session, unreachable or [])
+            await crud.release_broadcast_job(session, job_id, unsent)
+        logger.info(f"Broadcast job #{job_id}: released at cursor {cursor}, {len(unsent or [])} sends deferred")
+
+    async def _report_progress(self, job_id: int, progress: BroadcastProgress) -> None:
+        # Heartbeat и внутри порции: долгая порция (пауза 429, приоритетный трафик)
+        # не должна выглядеть брошенной для воркера другого процесса
+        heartbeat_every = self.stale_after.total_seconds() / 3
+        last_heartbeat = time.monotonic()
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            await self._publish(job_id, "running", progress)
+            if time.monotonic() - last_heartbeat >= heartbeat_every:
+                last_heartbeat = time.monotonic()
+                try:
+                    async with self.session_factory() as session:
+                        await crud.heartbeat_broadcast_job(session, job_id, self.worker_id)
+                except Exception as e:
+                    logger.warning(f"Broadcast job #{job_id}: heartbeat failed: {e}")
+
+    async def _publish(self, job_id: int, status: str, progress: BroadcastProgress) -> None:
+        if not self.on_progress:
+            return
+        try:
+            await self.on_progress(
+                {"type": "broadcast_progress", "job_id": job_id, "status": status, **progress.snapshot()}
+            )
+        except Exception as e:
+            logger.warning(f"Failed to publish broadcast progress: {e}")
+
+    def _make_sender(self, job: BroadcastJob) -> SendFunc:
+        if job.from_chat_id and job.message_id:
+            async def send(chat_id: int) -> None:
+                await self.bot.copy_message(
+                    chat_id=chat_id,
+                    from_chat_id=job.from_chat_id,
+                    message_id=job.message_id,
+                )
+        elif job.photo_url:
+            photo = CachedPhoto(self.session_factory, job.photo_url)
+
+            async def send(chat_id: int) -> None:
+                await photo.send(
+                    lambda file: self.bot.send_photo(
+                        chat_id=chat_id,
+                        photo=file,
+                        caption=job.text,
+                        parse_mode="HTML",
+                    )
+                )
+        else:
+            async def send(chat_id: int) -> None:
+                await self.bot.send_message(chat_id=chat_id, text=job.text, parse_mode="HTML")
+        return send
+
+    async def _report(self, job: BroadcastJob) -> None:
+        if not job.created_by:
+            return
+        try:
+            with outbound_priority(Priority.NOTIFICATION):
+                await self.bot.send_message(
+                    job.created_by,
+                    f"✅ <b>Рассылка #{job.id} завершена!</b>\n\n"
+                    f"📤 Отправлено: <b>{job.sent}</b>\n"
+                    f"❌ Ошибок: <b>{job.failed}</b>\n"
+                    f"👥 Всего подписчиков: <b>{job.total}</b>",
+                    parse_mode="HTML",
+                )
+        except Exception as e:
+            logger.error(f"Failed to report broadcast job #{job.id}: {e}")
+
+
+def start_broadcast_worker(
+    bot: Bot,
+    session_factory: async_sessionmaker,
+    on_progress: ProgressListener | None = None,
+) -> BroadcastWorker:
+    """Запустить воркер рассылок в текущем процессе."""
+    global _worker
+    _worker = BroadcastWorker(bot, session_factory, on_progress=on_progress)
+    _worker.start()
+    return _worker
+
+
+async def stop_broadcast_worker() -> None:
+    global _worker
+    if _worker:
+        await _worker.stop()
+        _worker = None
+
+
+def wake_broadcast_worker() -> None:
+    """Сразу взять новое задание (иначе воркер заберёт его при следующем опросе)."""
+    if _worker:
+        _worker.wake()
@@ -5,7 +5,11 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
-from app.bot.middleware.rate_limit import RateLimitMiddleware
+from app.bot.middleware.db_statements import DbStatementsMiddleware
+from app.bot.middleware.handler_metrics import setup_handler_metrics
+from app.bot.middleware.rate_limit import RateLimitMiddleware, create_rate_limiter
+from app.bot.outbound import get_outbound_scheduler
+from app.bot.session import create_session
 from app.config import get_settings
 from app.db.base import session_factory, engine, Base
 from app.db import models  # noqa: F401
@@ -13,6 +17,8 @@ from app.db import models  # noqa: F401
 # Глобальные bot и dispatcher для webhook
 _webhook_bot: Bot | None = None
 _webhook_dp: Dispatcher | None = None
+_rate_limiter: RateLimitMiddleware | None = None
+_handled_update_types: frozenset[str] | None = None
 
 
 async def init_database():
@@ -32,24 +38,47 @@ async def init_database():
 
 
 def get_bot() -> Bot:
-    """Get or create global bot instance."""
+    """Get or create global bot instance (shared by all outbound requests)."""
     global _webhook_bot
     if _webhook_bot is None:
         settings = get_settings()
-        _webhook_bot = Bot(token=settings.bot_token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+        session = create_session(settings)
+        # Все исходящие сообщения проходят через общий планировщик лимитов
+        session.middleware(get_outbound_scheduler())
+        _webhook_bot = Bot(
+            token=settings.bot_token,
+            session=session,
+            default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+        )
     return _webhook_bot
 
 
+async def close_bot() -> None:
+    """Close the global bot HTTP session and rate limiter backend (once, on shutdown)."""
+    global _webhook_bot, _rate_limiter
+    if _webhook_bot is not None:
+        await _webhook_bot.session.close()
+        _webhook_bot = None
+        # Планировщик подключён к сессии бота; его dispatcher иначе переживёт её
+        await get_outbound_scheduler().close()
+        get_outbound_scheduler.cache_clear()
+    if _rate_limiter is not None:
+        await _rate_limiter.close()
+        _rate_limiter = None
+
+
 def get_dispatcher() -> Dispatcher:
     """Get or create global dispatcher with all handlers."""
-    global _webhook_dp
+    global _webhook_dp, _rate_limiter
     if _webhook_dp is None:
         settings = get_settings()
         _webhook_dp = Dispatcher()
         
         # Middleware
-        _webhook_dp.message.middleware(RateLimitMiddleware())
-        _webhook_dp.callback_query.middleware(RateLimitMiddleware())
+        _webhook_dp.update.outer_middleware(DbStatementsMiddleware())
+        _rate_limiter = create_rate_limiter(settings)
+        _rate_limiter.setup(_webhook_dp)
+        setup_handler_metrics(_webhook_dp)  # Последним: inner-часть — перед самим хендлером
         
         # Register all handlers
         from app.bot.handlers.admin import register_admin_handlers
@@ -67,6 +96,19 @@ def get_dispatcher() -> Dispatcher:
     return _webhook_dp
 
 
+def get_handled_update_types() -> frozenset[str]:
+    """Типы апдейтов, для которых в dispatcher есть хендлеры."""
+    global _handled_update_types
+    if _handled_update_types is None:
+        _handled_update_types = frozenset(get_dispatcher().resolve_used_update_types())
+    return _handled_update_types
+
+
+async def is_rate_limited(update_type: str | None, user_id: int | None) -> bool:
+    """Отбросит ли rate limiter этот апдейт (проверка без его учёта)."""
+    return _rate_limiter is not None and await _rate_limiter.would_limit(update_type, user_id)
+
+
 def create_bot() -> Bot:
     """Create bot instance (alias for get_bot)."""
     return get_bot()
@@ -9,6 +9,7 @@ from aiogram.types import Message
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from app.admin_ids import get_all_admin_ids
+from app.bot.broadcast_worker import wake_broadcast_worker
 from app.config import Settings
 from app.db import crud
 
@@ -362,7 +363,6 @@ def create_admin_router(session_factory: async_sessionmaker, settings: Settings)
     @router.message(lambda msg: True)
     async def handle_broadcast_message(message: Message) -> None:
         """Обработка сообщения для рассылки."""
-        from aiogram import Bot
         from app.db import crud as db_crud
 
         # Проверяем что это админ
@@ -373,43 +373,26 @@ def create_admin_router(session_factory: async_sessionmaker, settings: Settings)
         if not _broadcast_state.get(message.from_user.id):
             return
 
-        async with session_factory() as session:
-            subscribers = await db_crud.get_active_subscribers(session)
-
-        if not subscribers:
-            await message.answer("❌ Нет подписчиков для рассылки.")
-            _broadcast_state.pop(message.from_user.id, None)
-            return
-
-        bot = Bot(token=settings.bot_token)
-        success_count = 0
-        fail_count = 0
-
-        # Отправляем сообщение всем подписчикам
-        for sub in subscribers:
-            try:
-                # Копируем сообщение
-                await bot.copy_message(
-                    chat_id=sub.telegram_id,
-                    from_chat_id=message.chat.id,
-                    message_id=message.message_id,
-                )
-                await db_crud.update_last_mailed(session, sub.telegram_id)
-                success_count += 1
-            except Exception as e:
-                logger.error(f"Failed to send to {sub.telegram_id}: {e}")
-                fail_count += 1
-            await asyncio.sleep(0.05)  # Anti-flood
+        _broadcast_state.pop(message.from_user.id, None)
 
-        await bot.session.close()
+        # Рассылку выполняет фоновый воркер, итог придёт отдельным сообщением
+        async with session_factory() as session:
+            if not await db_crud.get_subscribers_count(session):
+                await message.answer("❌ Нет подписчиков для рассылки.")
+                return
+            job = await db_crud.create_broadcast_job(
+                session,
+                from_chat_id=message.chat.id,
+                message_id=message.message_id,
+                created_by=message.chat.id,
+            )
 
-        _broadcast_state.pop(message.from_user.id, None)
+        wake_broadcast_worker()
 
         await message.answer(
-            f"✅ <b>Рассылка завершена!</b>\n\n"
-            f"📤 Отправлено: <b>{success_count}</b>\n"
-            f"❌ Ошибок: <b>{fail_count}</b>\n"
-            f"👥 Всего подписчиков: <b>{len(subscribers)}</b>",
+            f"📢 <b>Рассылка #{job.id} поставлена в очередь</b>\n\n"
+            f"👥 Подписчиков: <b>{job.total}</b>\n"
+            f"Итог придёт сообщением после завершения.",
             parse_mode="HTML"
         )
 
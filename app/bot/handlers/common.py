@@ -30,14 +30,8 @@ def register_common_handlers(session_factory: async_sessionmaker, settings: Sett
             return
         async with session_factory() as session:
             print(f"[HANDLER] Creating client...", flush=True)
-            await crud.get_or_create_client(
-                session=session,
-                telegram_id=message.from_user.id,
-                username=message.from_user.username,
-                full_name=message.from_user.full_name,
-            )
-            # Автоматическая подписка на рассылку
-            await crud.add_subscriber(
+            # Клиент + автоматическая подписка на рассылку одной транзакцией
+            await crud.onboard_user(
                 session=session,
                 telegram_id=message.from_user.id,
                 username=message.from_user.username,
@@ -128,7 +122,7 @@ def register_common_handlers(session_factory: async_sessionmaker, settings: Sett
             await callback.answer()
             return
         async with session_factory() as session:
-            client = await crud.get_or_create_client(
+            client = await crud.ensure_client(
                 session=session,
                 telegram_id=callback.from_user.id,
                 username=callback.from_user.username,
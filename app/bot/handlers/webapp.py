@@ -9,6 +9,7 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from app.admin_ids import get_all_admin_ids
+from app.bot.outbound import Priority, outbound_priority
 from app.config import Settings
 from app.db import crud
 
@@ -95,30 +96,31 @@ def register_webapp_handlers(session_factory: async_sessionmaker, settings: Sett
 
             # Отправляем в чат работников или всем админам
             logging.info(f"Отправка уведомления в чат работников: {settings.workers_chat_id}")
-            if settings.workers_chat_id:
-                try:
-                    await message.bot.send_message(
-                        settings.workers_chat_id,
-                        admin_text,
-                        reply_markup=keyboard,
-                    )
-                    logging.info(f"Уведомление отправлено в чат {settings.workers_chat_id}")
-                except Exception as e:
-                    logging.error(f"Ошибка отправки в чат работников: {e}")
-                    # Если не удалось отправить в чат работников, отправляем админам
+            with outbound_priority(Priority.NOTIFICATION):
+                if settings.workers_chat_id:
+                    try:
+                        await message.bot.send_message(
+                            settings.workers_chat_id,
+                            admin_text,
+                            reply_markup=keyboard,
+                        )
+                        logging.info(f"Уведомление отправлено в чат {settings.workers_chat_id}")
+                    except Exception as e:
+                        logging.error(f"Ошибка отправки в чат работников: {e}")
+                        # Если не удалось отправить в чат работников, отправляем админам
+                        for admin_id in get_all_admin_ids(settings):
+                            await message.bot.send_message(
+                                admin_id,
+                                admin_text,
+                                reply_markup=keyboard,
+                            )
+                else:
                     for admin_id in get_all_admin_ids(settings):
                         await message.bot.send_message(
                             admin_id,
                             admin_text,
                             reply_markup=keyboard,
                         )
-            else:
-                for admin_id in get_all_admin_ids(settings):
-                    await message.bot.send_message(
-                        admin_id,
-                        admin_text,
-                        reply_markup=keyboard,
-                    )
             return
 
         if action == "booking_canceled":
@@ -142,15 +144,16 @@ def register_webapp_handlers(session_factory: async_sessionmaker, settings: Sett
                 f"Стол освобождён."
             )
             
-            if settings.workers_chat_id:
-                try:
-                    await message.bot.send_message(settings.workers_chat_id, admin_text)
-                    logging.info(f"Уведомление об отмене отправлено в чат {settings.workers_chat_id}")
-                except Exception as e:
-                    logging.error(f"Ошибка отправки уведомления об отмене: {e}")
-            else:
-                for admin_id in get_all_admin_ids(settings):
-                    await message.bot.send_message(admin_id, admin_text)
+            with outbound_priority(Priority.NOTIFICATION):
+                if settings.workers_chat_id:
+                    try:
+                        await message.bot.send_message(settings.workers_chat_id, admin_text)
+                        logging.info(f"Уведомление об отмене отправлено в чат {settings.workers_chat_id}")
+                    except Exception as e:
+                        logging.error(f"Ошибка отправки уведомления об отмене: {e}")
+                else:
+                    for admin_id in get_all_admin_ids(settings):
+                        await message.bot.send_message(admin_id, admin_text)
             return
 
         if action == "review_created":
@@ -0,0 +1,78 @@
+"""Однократная загрузка медиа: URL отправляется в Telegram один раз, дальше — file_id."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db import crud
+
+logger = logging.getLogger(__name__)
+
+SendPhoto = Callable[[str], Awaitable[Message]]
+
+
+class CachedPhoto:
+    """Фото по URL, которое после первой успешной отправки заменяется на file_id.
+
+    file_id сохраняется в таблицу media_cache, поэтому переиспользуется
+    и следующими рассылками, и любыми отправками той же картинки
+    (например, Promotion.image_url).
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, url: str) -> None:
+        self.session_factory = session_factory
+        self.url = url
+        self.file_id: str | None = None
+        self._loaded = False
+        self._verified = False  # file_id уже принимался Telegram
+        self._lock = asyncio.Lock()
+
+    async def send(self, send_photo: SendPhoto) -> Message:
+        """Отправить фото; `send_photo` получает file_id или URL."""
+        if self.file_id:
+            return await self._send_file_id(send_photo, self.file_id)
+
+        # Пока идёт первая загрузка, остальные отправители ждут её file_id
+        async with self._lock:
+            if not self._loaded:
+                async with self.session_factory() as session:
+                    self.file_id = await crud.get_cached_file_id(session, self.url)
+                self._loaded = True
+            if not self.file_id:
+                return await self._upload(send_photo)
+            file_id = self.file_id
+        return await self._send_file_id(send_photo, file_id)
+
+    async def _send_file_id(self, send_photo: SendPhoto, file_id: str) -> Message:
+        try:
+            message = await send_photo(file_id)
+        except TelegramBadRequest as e:
+            if self._verified and self.file_id == file_id:
+                raise  # file_id рабочий — ошибка в самом чате
+            # Закэшированный file_id мог стать недействительным (другой токен бота,
+            # другая картинка по тому же URL): один раз загружаем по URL заново
+            async with self._lock:
+                if self.file_id == file_id:
+                    logger.warning(f"Cached file_id for {self.url} rejected ({e.message}), re-uploading")
+                    return await self._upload(send_photo)
+            return await send_photo(self.file_id)  # Другой отправитель уже загрузил заново
+        self._verified = True
+        return message
+
+    async def _upload(self, send_photo: SendPhoto) -> Message:
+        """Отправить по URL и сохранить (перезаписать) полученный file_id."""
+        message = await send_photo(self.url)
+        if message.photo:
+            self.file_id = message.photo[-1].file_id
+            self._verified = True
+            try:
+                async with self.session_factory() as session:
+                    await crud.save_cached_file_id(session, self.url, self.file_id)
+            except Exception as e:
+                logger.error(f"Failed to cache file_id for {self.url}: {e}")
+        return message
@@ -0,0 +1,23 @@
+"""Счётчик SQL-запросов на один апдейт Telegram."""
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.db.instrumentation import track_statements
+
+
+class DbStatementsMiddleware(BaseMiddleware):
+    """Outer middleware на dp.update: всё, что сделали хендлеры апдейта, — в одну метрику."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        with track_statements("update"):
+            return await handler(event, data)
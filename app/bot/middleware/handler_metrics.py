@@ -0,0 +1,94 @@
+"""Метрики обработки апдейтов: задержки, счётчики, ошибки и in-flight по хендлерам.
+
+Два middleware пишут в app.metrics (см. /api/admin/metrics):
+- UpdateMetricsMiddleware — outer на dp.update, время всего апдейта:
+  bot.update_ms[<тип>], bot.updates[<тип>], bot.update_errors[<тип>],
+  bot.updates_unhandled[<тип>], gauge bot.updates_in_flight;
+- HandlerMetricsMiddleware — inner, регистрируется последним, то есть
+  непосредственно перед хендлером: bot.handler_ms[<router>.<хендлер>],
+  bot.handler_calls[...], bot.handler_errors[...], gauge bot.handlers_in_flight[...]
+  и bot.middleware_wait_ms[<тип>] — время от входа апдейта до хендлера
+  (outer/inner middleware, rate limiter, фильтры).
+"""
+from __future__ import annotations
+
+import time
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject
+
+from app.metrics import get_metrics
+
+if TYPE_CHECKING:
+    from aiogram import Dispatcher
+
+_STARTED_KEY = "metrics_update_started"
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        metrics = get_metrics()
+        update_type = getattr(event, "event_type", "unknown")
+        started = data[_STARTED_KEY] = time.perf_counter()
+        metrics.gauge_add("bot.updates_in_flight", 1)
+        try:
+            result = await handler(event, data)
+        except Exception:
+            metrics.increment(f"bot.update_errors[{update_type}]")
+            raise
+        finally:
+            metrics.gauge_add("bot.updates_in_flight", -1)
+            metrics.increment(f"bot.updates[{update_type}]")
+            metrics.observe(f"bot.update_ms[{update_type}]", (time.perf_counter() - started) * 1000)
+        if result is UNHANDLED:
+            metrics.increment(f"bot.updates_unhandled[{update_type}]")
+        return result
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        metrics = get_metrics()
+        started = time.perf_counter()
+        update_started = data.get(_STARTED_KEY)
+        if update_started is not None:
+            update = data.get("event_update")
+            update_type = update.event_type if update is not None else "unknown"
+            metrics.observe(f"bot.middleware_wait_ms[{update_type}]", (started - update_started) * 1000)
+
+        router = data.get("event_router")
+        handler_object = data.get("handler")
+        callback = handler_object.callback if handler_object is not None else None
+        name = f"{getattr(router, 'name', '?')}.{getattr(callback, '__name__', '?')}"
+
+        metrics.gauge_add(f"bot.handlers_in_flight[{name}]", 1)
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.increment(f"bot.handler_errors[{name}]")
+            raise
+        finally:
+            metrics.gauge_add(f"bot.handlers_in_flight[{name}]", -1)
+            metrics.increment(f"bot.handler_calls[{name}]")
+            metrics.observe(f"bot.handler_ms[{name}]", (time.perf_counter() - started) * 1000)
+
+
+def setup_handler_metrics(dispatcher: Dispatcher) -> None:
+    """Подключить метрики; вызывать после остальных middleware, чтобы inner-часть была последней."""
+    dispatcher.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_metrics = HandlerMetricsMiddleware()
+    for name, observer in dispatcher.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(handler_metrics)
@@ -1,19 +1,155 @@
-"""Rate limiting middleware for aiogram 3.x."""
+"""Rate limiting входящих апдейтов: token bucket на пользователя и тип апдейта.
+
+Лимиты задаются отдельно для каждого типа апдейта (message, callback_query...).
+Состояние хранит backend:
+- MemoryRateLimitBackend — в памяти процесса; бакет удаляется, как только
+  полностью восстановился (такой бакет ничем не отличается от отсутствующего),
+  поэтому память занимают только активные пользователи;
+- RedisRateLimitBackend — общий для нескольких процессов (webhook + polling,
+  несколько реплик); нужен пакет redis.
+"""
 from __future__ import annotations
 
+import logging
 import time
+from collections import OrderedDict
 from collections.abc import Awaitable, Callable
-from typing import Any
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Protocol
 
 from aiogram import BaseMiddleware
-from aiogram.types import CallbackQuery, Message, TelegramObject
+from aiogram.types import TelegramObject
 
+from app.metrics import get_metrics
 
-class RateLimitMiddleware(BaseMiddleware):
-    """Simple rate limiting middleware."""
+if TYPE_CHECKING:
+    from aiogram import Dispatcher
+
+    from app.config import Settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimit:
+    rate: float  # Токенов в секунду
+    burst: float  # Ёмкость бакета: сколько апдейтов подряд можно без паузы
+
+
+class RateLimitBackend(Protocol):
+    async def consume(self, key: str, limit: RateLimit) -> bool:
+        """Списать токен; False — лимит исчерпан (токен не списывается)."""
+
+    async def peek(self, key: str, limit: RateLimit) -> bool:
+        """Есть ли токен, без списания."""
 
+    async def close(self) -> None: ...
+
+
+class MemoryRateLimitBackend:
     def __init__(self) -> None:
-        self.cache: dict[int, float] = {}
+        # key -> (tokens, updated, full_at); порядок — по последнему обращению
+        self._buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _tokens(self, key: str, limit: RateLimit, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return limit.burst
+        tokens, updated, _ = bucket
+        return min(limit.burst, tokens + (now - updated) * limit.rate)
+
+    async def consume(self, key: str, limit: RateLimit) -> bool:
+        now = time.monotonic()
+        self._evict(now)
+        tokens = self._tokens(key, limit, now)
+        if tokens < 1:
+            return False
+        tokens -= 1
+        self._buckets[key] = (tokens, now, now + (limit.burst - tokens) / limit.rate)
+        self._buckets.move_to_end(key)
+        return True
+
+    async def peek(self, key: str, limit: RateLimit) -> bool:
+        return self._tokens(key, limit, time.monotonic()) >= 1
+
+    def _evict(self, now: float) -> None:
+        # Самые давние обращения — в начале; O(1) амортизированно на вызов
+        while self._buckets:
+            key, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now:
+                break
+            del self._buckets[key]
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+
+# Бакет как hash {tokens, updated}; часы — TIME сервера Redis, общие для всех процессов.
+# ARGV: rate, burst, cost (0 — только проверить). Ключ живёт, пока бакет не восстановится.
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - updated) * rate)
+if tokens < 1 then
+    return 0
+end
+if cost > 0 then
+    tokens = tokens - cost
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000))
+end
+return 1
+"""
+
+
+class RedisRateLimitBackend:
+    def __init__(self, url: str, prefix: str = "filin:ratelimit:") -> None:
+        from redis.asyncio import Redis  # Опциональная зависимость
+
+        self.prefix = prefix
+        self._redis = Redis.from_url(url)
+        self._script = self._redis.register_script(_TOKEN_BUCKET_LUA)
+
+    async def _call(self, key: str, limit: RateLimit, cost: int) -> bool:
+        return bool(await self._script(keys=[self.prefix + key], args=[limit.rate, limit.burst, cost]))
+
+    async def consume(self, key: str, limit: RateLimit) -> bool:
+        return await self._call(key, limit, 1)
+
+    async def peek(self, key: str, limit: RateLimit) -> bool:
+        return await self._call(key, limit, 0)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class RateLimitMiddleware(BaseMiddleware):
+    """Отбрасывает апдейты пользователя сверх лимита его типа апдейта."""
+
+    def __init__(self, limits: dict[str, RateLimit], backend: RateLimitBackend | None = None) -> None:
+        self.limits = limits
+        self.backend = backend or MemoryRateLimitBackend()
+
+    def setup(self, dispatcher: Dispatcher) -> None:
+        """Подключить к observer'ам всех типов апдейтов, для которых задан лимит."""
+        for update_type in self.limits:
+            dispatcher.observers[update_type].middleware(self)
+
+    async def would_limit(self, update_type: str | None, user_id: int | None) -> bool:
+        """Будет ли апдейт отброшен (проверка без списания токена)."""
+        limit = self.limits.get(update_type or "")
+        if limit is None or user_id is None:
+            return False
+        return not await self.backend.peek(f"{update_type}:{user_id}", limit)
 
     async def __call__(
         self,
@@ -21,21 +157,31 @@ class RateLimitMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: dict[str, Any],
     ) -> Any:
-        # Get user id from message or callback query
-        user_id = None
-        if isinstance(event, Message):
-            user_id = event.from_user.id if event.from_user else None
-        elif isinstance(event, CallbackQuery):
-            user_id = event.from_user.id if event.from_user else None
-
-        if user_id is None:
+        user = data.get("event_from_user")
+        update = data.get("event_update")
+        update_type = update.event_type if update is not None else None
+        limit = self.limits.get(update_type or "")
+        if user is None or limit is None:
             return await handler(event, data)
 
-        # Check rate limit (1 second between messages)
-        now = time.time()
-        if user_id in self.cache:
-            if now - self.cache[user_id] < 1.0:
-                return None  # Skip this update
-        self.cache[user_id] = now
-
+        metrics = get_metrics()
+        started = time.perf_counter()
+        allowed = await self.backend.consume(f"{update_type}:{user.id}", limit)
+        metrics.observe("bot.rate_limit_ms", (time.perf_counter() - started) * 1000)
+        if not allowed:
+            metrics.increment(f"bot.rate_limited[{update_type}]")
+            return None  # Skip this update
         return await handler(event, data)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def create_rate_limiter(settings: Settings) -> RateLimitMiddleware:
+    """Лимитер из настроек: Redis, если задан RATE_LIMIT_REDIS_URL, иначе память процесса."""
+    limits = {update_type: RateLimit(rate, burst) for update_type, (rate, burst) in settings.rate_limits.items()}
+    backend: RateLimitBackend | None = None
+    if settings.rate_limit_redis_url:
+        backend = RedisRateLimitBackend(settings.rate_limit_redis_url)
+        logger.info("Rate limiter uses shared Redis backend")
+    return RateLimitMiddleware(limits, backend)
@@ -0,0 +1,196 @@
+"""Общий планировщик исходящих сообщений Bot API.
+
+Все отправки процесса (ответы хендлеров, уведомления персоналу, рассылки)
+проходят через один request middleware на общем Bot. Он держит глобальный
+лимит Telegram и лимиты по чатам, а свободные токены выдаёт сначала более
+приоритетным запросам: интерактивные ответы не ждут, пока идёт рассылка,
+а рассылка получает всю оставшуюся пропускную способность.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+
+from app.config import get_settings
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # Ответы пользователям
+    NOTIFICATION = 1  # Уведомления персоналу
+    BULK = 2  # Рассылки
+
+
+_priority: ContextVar[Priority] = ContextVar("outbound_priority", default=Priority.INTERACTIVE)
+
+# Лимитируются только методы, отправляющие сообщения
+_LIMITED_PREFIXES = ("send", "copy", "forward")
+
+
+def set_outbound_priority(priority: Priority) -> None:
+    """Задать приоритет для всех запросов текущей задачи."""
+    _priority.set(priority)
+
+
+@contextmanager
+def outbound_priority(priority: Priority) -> Iterator[None]:
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class PriorityTokenBucket:
+    """Token bucket, отдающий освободившийся токен самому приоритетному ожидающему."""
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._counter = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены `seconds` секунд (ответ 429 с retry_after)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE) -> None:
+        now = time.monotonic()
+        if not self._waiters and now >= self._paused_until:
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def close(self) -> None:
+        """Остановить раздачу токенов: отменить dispatcher и ожидающих."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():  # Ожидающий мог быть отменён
+                self._tokens -= 1
+                future.set_result(None)
+
+
+class ChatRateLimiter:
+    """Token bucket на каждый чат с вытеснением простаивающих чатов."""
+
+    def __init__(self, rate: float, burst: float, max_tracked: int = 10_000) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_tracked = max_tracked
+        self._buckets: dict[int | str, tuple[float, float]] = {}  # chat_id -> (tokens, updated)
+
+    def reserve(self, chat_id: int | str) -> float:
+        """Занять место под сообщение; вернуть, сколько секунд нужно подождать."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(chat_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate) - 1
+        self._buckets[chat_id] = (tokens, now)
+        if len(self._buckets) > self.max_tracked:
+            self._prune(now)
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+    def _prune(self, now: float) -> None:
+        # Чат, бакет которого уже восстановился полностью, хранить незачем
+        full_after = self.burst / self.rate
+        for chat_id, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[chat_id]
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """Request middleware: глобальный и per-chat лимиты с приоритетами."""
+
+    def __init__(self, rate: float, chat_rate: float, chat_burst: float) -> None:
+        self.bucket = PriorityTokenBucket(rate)
+        self.chat_limiter = ChatRateLimiter(chat_rate, chat_burst)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if not method.__api_method__.startswith(_LIMITED_PREFIXES):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None:
+            delay = self.chat_limiter.reserve(chat_id)
+            if delay:
+                await asyncio.sleep(delay)
+        await self.bucket.acquire(_priority.get())
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter as e:
+            # Flood control касается всего бота: притормозить все отправки
+            self.bucket.pause(e.retry_after)
+            raise
+
+    async def close(self) -> None:
+        await self.bucket.close()
+
+
+@lru_cache(maxsize=1)
+def get_outbound_scheduler() -> OutboundScheduler:
+    """Общий для процесса планировщик (подключается к сессии общего Bot).
+
+    Лимит OUTBOUND_RATE_LIMIT действует в пределах процесса: процессы
+    с одним токеном (webapp и бот в docker-compose) делят бюджет Telegram.
+    """
+    settings = get_settings()
+    return OutboundScheduler(
+        rate=settings.outbound_rate_limit,
+        chat_rate=settings.outbound_chat_rate,
+        chat_burst=settings.outbound_chat_burst,
+    )
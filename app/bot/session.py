@@ -0,0 +1,51 @@
+"""HTTP-сессия Bot API с настраиваемым пулом соединений и таймаутами."""
+from __future__ import annotations
+
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from app.config import Settings
+
+
+class PooledSession(AiohttpSession):
+    """AiohttpSession с keep-alive, DNS-кэшем и таймаутами по методам API."""
+
+    def __init__(
+        self,
+        limit: int,
+        keepalive_timeout: float,
+        dns_cache_ttl: int,
+        timeout: float,
+        method_timeouts: dict[str, float] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(limit=limit, timeout=timeout, **kwargs)
+        self._connector_init.update(
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=dns_cache_ttl,
+        )
+        self.method_timeouts = method_timeouts or {}
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: int | None = None,
+    ) -> TelegramType:
+        if timeout is None:
+            timeout = self.method_timeouts.get(method.__api_method__)
+        return await super().make_request(bot, method, timeout=timeout)
+
+
+def create_session(settings: Settings) -> PooledSession:
+    return PooledSession(
+        limit=settings.bot_pool_limit,
+        keepalive_timeout=settings.bot_keepalive_timeout,
+        dns_cache_ttl=settings.bot_dns_cache_ttl,
+        timeout=settings.bot_request_timeout,
+        method_timeouts=settings.bot_method_timeouts,
+    )
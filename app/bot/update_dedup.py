@@ -0,0 +1,47 @@
+"""Отсев повторных доставок webhook по update_id.
+
+Telegram повторяет доставку, если ответ был медленным или с ошибкой.
+Помним последние N update_id (кольцевой буфер + множество), так что
+память постоянна, а проверка — O(1).
+"""
+from __future__ import annotations
+
+from collections import deque
+from functools import lru_cache
+
+from app.config import get_settings
+
+
+class UpdateDeduplicator:
+    def __init__(self, capacity: int = 10_000) -> None:
+        self._order: deque[int] = deque()
+        self._seen: set[int] = set()
+        self.capacity = capacity
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def check_and_remember(self, update_id: int) -> bool:
+        """True, если апдейт уже был; иначе запомнить его и вернуть False."""
+        if update_id in self._seen:
+            self.duplicates += 1
+            return True
+        self._seen.add(update_id)
+        self._order.append(update_id)
+        if len(self._order) > self.capacity:
+            self._seen.discard(self._order.popleft())
+        return False
+
+    def forget(self, update_id: int) -> None:
+        """Апдейт не принят (очередь полна) — повторную доставку надо обработать."""
+        if update_id in self._seen:
+            self._seen.discard(update_id)
+            # Иначе устаревшая копия в кольце при вытеснении сотрёт повторно запомненный id.
+            # O(N), но forget вызывается только при отказе в приёме
+            self._order.remove(update_id)
+
+
+@lru_cache(maxsize=1)
+def get_update_dedup() -> UpdateDeduplicator:
+    return UpdateDeduplicator(get_settings().webhook_dedup_size)
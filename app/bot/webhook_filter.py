@@ -0,0 +1,53 @@
+"""Быстрая предварительная проверка webhook-запроса до pydantic-валидации.
+
+Тело разбирается orjson в обычный dict, из которого берутся update_id,
+тип апдейта и id отправителя. Этого хватает, чтобы отклонить запрос без
+секретного токена и сразу подтвердить повторы, апдейты без обработчиков
+и апдейты пользователей, которых всё равно отбросит rate limiter, —
+полная валидация Update нужна только тому, что действительно дойдёт до хендлеров.
+"""
+from __future__ import annotations
+
+import hmac
+from dataclasses import dataclass
+from typing import Any
+
+import orjson
+
+
+@dataclass(slots=True)
+class WebhookEnvelope:
+    update_id: int
+    update_type: str | None
+    sender_id: int | None
+    data: dict[str, Any]
+
+
+def secret_matches(header: str | None, secret: str) -> bool:
+    """Проверка X-Telegram-Bot-Api-Secret-Token (без секрета — не проверяем)."""
+    if not secret:
+        return True
+    return header is not None and hmac.compare_digest(header, secret)
+
+
+def parse_webhook(body: bytes) -> WebhookEnvelope | None:
+    """Разобрать тело webhook; None — не похоже на апдейт Telegram."""
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    update_id = data.get("update_id")
+    if not isinstance(update_id, int):
+        return None
+
+    # Кроме update_id в апдейте ровно одно поле — само событие
+    update_type = next((key for key in data if key != "update_id"), None)
+    sender_id = None
+    event = data.get(update_type) if update_type else None
+    if isinstance(event, dict):
+        sender = event.get("from") or event.get("user")
+        if isinstance(sender, dict) and isinstance(sender.get("id"), int):
+            sender_id = sender["id"]
+    return WebhookEnvelope(update_id, update_type, sender_id, data)
@@ -0,0 +1,96 @@
+"""Асинхронная обработка webhook-апдейтов.
+
+Эндпоинт только проверяет апдейт, кладёт его в очередь и сразу отвечает
+Telegram. Очередь разбита на шарды по чату: у каждого шарда свой воркер,
+поэтому апдейты одного чата обрабатываются строго по порядку, а разные
+чаты — параллельно (до числа воркеров).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+_queue: WebhookQueue | None = None
+
+
+def _chat_key(update: Update) -> int:
+    """Ключ упорядочивания: чат, иначе пользователь, иначе сам апдейт."""
+    context = UserContextMiddleware.resolve_event_context(update)
+    if context.chat:
+        return context.chat.id
+    if context.user:
+        return context.user.id
+    return update.update_id
+
+
+class WebhookQueue:
+    def __init__(self, bot: Bot, dispatcher: Dispatcher, workers: int = 8, max_depth: int = 1000) -> None:
+        self.bot = bot
+        self.dispatcher = dispatcher
+        shard_size = max(1, -(-max_depth // workers))  # ceil: общая глубина ~ max_depth
+        self._shards = [asyncio.Queue(maxsize=shard_size) for _ in range(workers)]
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return sum(shard.qsize() for shard in self._shards)
+
+    def enqueue(self, update: Update) -> bool:
+        """Поставить апдейт в очередь его чата. False — шард переполнен."""
+        shard = self._shards[_chat_key(update) % len(self._shards)]
+        try:
+            shard.put_nowait(update)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work(shard)) for shard in self._shards]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Дообработать очередь (не дольше `timeout`), затем остановить воркеры."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(shard.join() for shard in self._shards)),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook queue stopped with {self.depth} unprocessed updates")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self, shard: asyncio.Queue) -> None:
+        while True:
+            update = await shard.get()
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Update {update.update_id} failed: {e}", exc_info=True)
+            finally:
+                shard.task_done()
+
+
+def start_webhook_queue(bot: Bot, dispatcher: Dispatcher, workers: int, max_depth: int) -> WebhookQueue:
+    global _queue
+    _queue = WebhookQueue(bot, dispatcher, workers, max_depth)
+    _queue.start()
+    return _queue
+
+
+async def stop_webhook_queue() -> None:
+    global _queue
+    if _queue:
+        queue, _queue = _queue, None
+        await queue.stop()
+
+
+def get_webhook_queue() -> WebhookQueue | None:
+    return _queue
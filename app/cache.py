@@ -0,0 +1,209 @@
+"""Ограниченный in-memory кэш с TTL и LRU-вытеснением.
+
+Записи хранятся в порядке последнего обращения; при превышении лимита
+по числу записей или по суммарному размеру вытесняются самые старые.
+Протухшие записи удаляются при чтении или вызовом `sweep()`; лимит
+записей не даёт памяти расти вместе с числом уникальных ключей.
+
+`get_or_load` объединяет одновременные промахи по одному ключу в одну
+загрузку (single-flight), а в течение `stale_ttl` после истечения TTL
+отдаёт старое значение, пока одна фоновая загрузка его обновляет.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+def approx_size(value: Any) -> int:
+    """Приблизительный размер значения в байтах (с вложенными контейнерами)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item) for item in value)
+    return size
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stale_hits: int = 0
+    loads: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class TTLCache:
+    """LRU-кэш с TTL, лимитом записей и (опционально) лимитом байт."""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 1024,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] = approx_size,
+        stale_ttl: float = 0.0,
+    ) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.stats = CacheStats()
+        # key -> (value, expires_at, size)
+        self._data: OrderedDict[str, tuple[Any, float, int]] = OrderedDict()
+        self._bytes = 0
+        # Инвалидация убирает задачу ключа: загрузка, начатая до неё, не сохраняется
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return default
+        value, expires_at, _ = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                self._remove(key)
+                self.stats.expirations += 1
+            self.stats.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    async def get_or_load(self, key: str, loader: Loader) -> Any:
+        """Значение из кэша или результат `loader` (одна загрузка на ключ)."""
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires_at, _ = entry
+            now = time.monotonic()
+            if expires_at > now:
+                self._data.move_to_end(key)
+                self.stats.hits += 1
+                return value
+            if expires_at + self.stale_ttl > now:
+                # Отдаём устаревшее значение, обновляем в фоне
+                self.stats.stale_hits += 1
+                if key not in self._inflight:
+                    self._start_load(key, loader).add_done_callback(self._log_refresh_error)
+                return value
+
+        self.stats.misses += 1
+        task = self._inflight.get(key) or self._start_load(key, loader)
+        # shield: отмена одного ожидающего не отменяет общую загрузку
+        return await asyncio.shield(task)
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            self.invalidate(key)  # Значение больше всего кэша — не храним
+            return
+        if key in self._data:
+            self._remove(key)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at, size)
+        self._bytes += size
+        self._evict()
+
+    def invalidate(self, key: str) -> None:
+        self._inflight.pop(key, None)
+        if key in self._data:
+            self._remove(key)
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        for key in [k for k in self._inflight if k.startswith(prefix)]:
+            del self._inflight[key]
+        for key in [k for k in self._data if k.startswith(prefix)]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._inflight.clear()
+        self._data.clear()
+        self._bytes = 0
+
+    def sweep(self) -> int:
+        """Удалить все протухшие записи; вернуть их число."""
+        now = time.monotonic()
+        expired = [
+            key for key, (_, expires_at, _) in self._data.items()
+            if expires_at + self.stale_ttl <= now
+        ]
+        for key in expired:
+            self._remove(key)
+        self.stats.expirations += len(expired)
+        return len(expired)
+
+    def snapshot(self) -> dict:
+        """Счётчики и текущий размер (для метрик)."""
+        return {
+            **asdict(self.stats),
+            "hit_ratio": round(self.stats.hit_ratio, 3),
+            "entries": len(self._data),
+            "bytes": self._bytes,
+        }
+
+    def _start_load(self, key: str, loader: Loader) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key, loader))
+        self._inflight[key] = task
+        return task
+
+    async def _load(self, key: str, loader: Loader) -> Any:
+        self.stats.loads += 1
+        task = asyncio.current_task()
+        try:
+            value = await loader()
+            # Задача ключа сменилась или убрана — ключ инвалидирован во время загрузки
+            if self._inflight.get(key) is task:
+                self.set(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            logger.error(f"Cache refresh failed: {task.exception()}")
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, _, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.stats.evictions += 1
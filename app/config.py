@@ -20,6 +20,29 @@ def _parse_admin_ids(raw: str) -> set[int]:
     return {int(item.strip()) for item in raw.split(",") if item.strip()}
 
 
+def _parse_method_timeouts(raw: str) -> dict[str, float]:
+    # Формат: "sendPhoto=120,getUpdates=60"
+    raw = _clean_env(raw)
+    timeouts: dict[str, float] = {}
+    for item in raw.split(","):
+        method, _, value = item.partition("=")
+        if method.strip() and value.strip():
+            timeouts[method.strip()] = float(value)
+    return timeouts
+
+
+def _parse_rate_limits(raw: str) -> dict[str, tuple[float, float]]:
+    # Формат: "message=1/3,callback_query=2/5" — тип апдейта = токенов в секунду / burst
+    raw = _clean_env(raw)
+    limits: dict[str, tuple[float, float]] = {}
+    for item in raw.split(","):
+        update_type, _, value = item.partition("=")
+        rate, _, burst = value.partition("/")
+        if update_type.strip() and rate.strip():
+            limits[update_type.strip()] = (float(rate), float(burst or 1))
+    return limits
+
+
 @dataclass(frozen=True)
 class Settings:
     bot_token: str
@@ -35,6 +58,46 @@ class Settings:
     db_max_overflow: int = field(default=5)
     db_pool_timeout: int = field(default=30)
     db_pool_recycle: int = field(default=1800)
+    # Outbound limits (лимиты Telegram: ~30 msg/s глобально, ~1 msg/s в один чат).
+    # Лимит — на процесс: процессы с одним BOT_TOKEN делят 28 msg/s между собой
+    outbound_rate_limit: float = field(default=28.0)
+    outbound_chat_rate: float = field(default=1.0)
+    outbound_chat_burst: float = field(default=3.0)
+    # Broadcast settings
+    broadcast_concurrency: int = field(default=8)
+    broadcast_flush_size: int = field(default=500)
+    broadcast_flush_interval_ms: int = field(default=1000)
+    broadcast_chunk_size: int = field(default=500)
+    broadcast_job_stale_after: int = field(default=60)
+    broadcast_worker_in_bot: bool = field(default=False)  # Деплой без webapp: воркер в процессе polling
+    # Bot API client (один на процесс)
+    bot_pool_limit: int = field(default=100)
+    bot_keepalive_timeout: float = field(default=60.0)
+    bot_dns_cache_ttl: int = field(default=300)
+    bot_request_timeout: float = field(default=30.0)
+    bot_method_timeouts: dict[str, float] = field(default_factory=dict)
+    # Кэш ответов WebApp
+    webapp_cache_ttl: float = field(default=30.0)
+    webapp_cache_stale_ttl: float = field(default=60.0)
+    # Rate limiting входящих апдейтов
+    rate_limits: dict[str, tuple[float, float]] = field(default_factory=dict)
+    rate_limit_redis_url: str = field(default="")
+    # Очередь webhook-апдейтов
+    webhook_secret: str = field(default="")
+    webhook_workers: int = field(default=8)
+    webhook_queue_size: int = field(default=1000)
+    webhook_dedup_size: int = field(default=10_000)
+    # Инструментирование SQL
+    db_instrumentation: bool = field(default=True)
+    db_slow_query_ms: float = field(default=200.0)
+    # SQLite (docker-compose): пул и PRAGMA
+    sqlite_pool_size: int = field(default=5)
+    sqlite_max_overflow: int = field(default=10)
+    sqlite_busy_timeout_ms: int = field(default=5000)
+    sqlite_mmap_size: int = field(default=268_435_456)
+    sqlite_cache_size: int = field(default=-20_000)  # Отрицательное — в КиБ
+    # Отложенная запись смены username/full_name (секунды)
+    profile_flush_interval: float = field(default=5.0)
 
 
 @lru_cache(maxsize=1)
@@ -61,4 +124,34 @@ def get_settings() -> Settings:
         db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "5")),
         db_pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "30")),
         db_pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        outbound_rate_limit=float(os.getenv("OUTBOUND_RATE_LIMIT", "28")),
+        outbound_chat_rate=float(os.getenv("OUTBOUND_CHAT_RATE", "1.0")),
+        outbound_chat_burst=float(os.getenv("OUTBOUND_CHAT_BURST", "3")),
+        broadcast_concurrency=int(os.getenv("BROADCAST_CONCURRENCY", "8")),
+        broadcast_flush_size=int(os.getenv("BROADCAST_FLUSH_SIZE", "500")),
+        broadcast_flush_interval_ms=int(os.getenv("BROADCAST_FLUSH_INTERVAL_MS", "1000")),
+        broadcast_chunk_size=int(os.getenv("BROADCAST_CHUNK_SIZE", "500")),
+        broadcast_job_stale_after=int(os.getenv("BROADCAST_JOB_STALE_AFTER", "60")),
+        broadcast_worker_in_bot=os.getenv("BROADCAST_WORKER_IN_BOT", "false").lower() in ("1", "true", "yes"),
+        bot_pool_limit=int(os.getenv("BOT_POOL_LIMIT", "100")),
+        bot_keepalive_timeout=float(os.getenv("BOT_KEEPALIVE_TIMEOUT", "60")),
+        bot_dns_cache_ttl=int(os.getenv("BOT_DNS_CACHE_TTL", "300")),
+        bot_request_timeout=float(os.getenv("BOT_REQUEST_TIMEOUT", "30")),
+        bot_method_timeouts=_parse_method_timeouts(os.getenv("BOT_METHOD_TIMEOUTS", "sendPhoto=120")),
+        webapp_cache_ttl=float(os.getenv("WEBAPP_CACHE_TTL", "30")),
+        webapp_cache_stale_ttl=float(os.getenv("WEBAPP_CACHE_STALE_TTL", "60")),
+        rate_limits=_parse_rate_limits(os.getenv("RATE_LIMITS", "message=1/3,callback_query=2/5")),
+        rate_limit_redis_url=_clean_env(os.getenv("RATE_LIMIT_REDIS_URL", "")),
+        webhook_secret=_clean_env(os.getenv("WEBHOOK_SECRET", "")),
+        webhook_workers=int(os.getenv("WEBHOOK_WORKERS", "8")),
+        webhook_queue_size=int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000")),
+        webhook_dedup_size=int(os.getenv("WEBHOOK_DEDUP_SIZE", "10000")),
+        db_instrumentation=os.getenv("DB_INSTRUMENTATION", "true").lower() in ("1", "true", "yes"),
+        db_slow_query_ms=float(os.getenv("DB_SLOW_QUERY_MS", "200")),
+        sqlite_pool_size=int(os.getenv("SQLITE_POOL_SIZE", "5")),
+        sqlite_max_overflow=int(os.getenv("SQLITE_MAX_OVERFLOW", "10")),
+        sqlite_busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        sqlite_mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", "268435456")),
+        sqlite_cache_size=int(os.getenv("SQLITE_CACHE_SIZE", "-20000")),
+        profile_flush_interval=float(os.getenv("PROFILE_FLUSH_INTERVAL", "5")),
     )
@@ -5,6 +5,8 @@ from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.pool import NullPool
 
 from app.config import get_settings
+from app.db.instrumentation import instrument_engine
+from app.db.sqlite import SQLiteSession, install_pragmas
 
 
 class Base(DeclarativeBase):
@@ -38,8 +40,21 @@ if is_postgresql:
         pool_recycle=settings.db_pool_recycle,
         pool_pre_ping=True,  # Проверка соединения перед использованием
     )
+elif is_sqlite and ":memory:" not in db_url:
+    # SQLite-файл: небольшой постоянный пул, WAL и PRAGMA на каждом соединении
+    engine = create_async_engine(
+        db_url,
+        echo=False,
+        future=True,
+        pool_size=settings.sqlite_pool_size,
+        # Сессия берёт соединение до lock записи (app.db.sqlite), поэтому владелец
+        # lock не ждёт пул; остальные ждут соединения не дольше pool_timeout
+        max_overflow=settings.sqlite_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    install_pragmas(engine, settings)
 elif is_sqlite:
-    # SQLite: NullPool для избежания проблем с блокировками
+    # SQLite в памяти: каждое соединение — своя БД, пул не нужен
     engine = create_async_engine(
         db_url,
         echo=False,
@@ -50,7 +65,15 @@ else:
     # Другие БД: default settings
     engine = create_async_engine(db_url, echo=False, future=True)
 
-session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+if settings.db_instrumentation:
+    instrument_engine(engine, settings.db_slow_query_ms)
+
+# Для SQLite пишущие транзакции процесса идут по очереди (см. app.db.sqlite)
+session_factory = async_sessionmaker(
+    engine,
+    class_=SQLiteSession if is_sqlite else AsyncSession,
+    expire_on_commit=False,
+)
 
 
 async def get_session() -> AsyncSession:
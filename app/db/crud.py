@@ -1,13 +1,84 @@
 from __future__ import annotations
 
-from datetime import UTC, datetime
+import hashlib
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
 from typing import Optional
 
-from sqlalchemy import desc, func, select, update
+from sqlalchemy import BigInteger, and_, any_, bindparam, delete, desc, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.db.models import Client, DynamicAdmin, Promotion, Review, Subscriber, VenueSettings
+from app.db.models import (
+    BroadcastDelivery,
+    BroadcastJob,
+    Client,
+    DynamicAdmin,
+    MediaCache,
+    Promotion,
+    Review,
+    Subscriber,
+    VenueSettings,
+)
+from app.db.write_behind import queue_profile_refresh
+from app.venue import invalidate_venue_snapshot
+
+
+def _upsert(session: AsyncSession, model):
+    """INSERT ... ON CONFLICT для диалекта сессии (PostgreSQL или SQLite)."""
+    if session.bind.dialect.name == "postgresql":
+        return pg_insert(model)
+    return sqlite_insert(model)
+
+
+def _client_upsert(
+    session: AsyncSession,
+    telegram_id: int,
+    username: str | None,
+    full_name: str | None,
+    phone: str | None = None,
+):
+    """Upsert клиента: пустые значения существующие данные не затирают."""
+    stmt = _upsert(session, Client).values(
+        telegram_id=telegram_id,
+        username=username,
+        full_name=full_name,
+        phone_hash=phone,
+    )
+    changes = {
+        column: stmt.excluded[column]
+        for column, value in (("username", username), ("full_name", full_name), ("phone_hash", phone))
+        if value
+    }
+    if not changes:
+        return stmt.on_conflict_do_nothing(index_elements=[Client.telegram_id])
+    # Строка обновляется, только если значения действительно другие
+    return stmt.on_conflict_do_update(
+        index_elements=[Client.telegram_id],
+        set_=changes,
+        where=or_(*(getattr(Client, column).is_distinct_from(value) for column, value in changes.items())),
+    )
+
+
+def _subscriber_upsert(
+    session: AsyncSession,
+    telegram_id: int,
+    username: str | None,
+    full_name: str | None,
+):
+    """Upsert подписчика: существующий снова становится активным."""
+    stmt = _upsert(session, Subscriber).values(
+        telegram_id=telegram_id,
+        username=username,
+        full_name=full_name,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[Subscriber.telegram_id],
+        set_={"is_active": True},
+    )
 
 
 async def get_or_create_client(
@@ -17,35 +88,88 @@ async def get_or_create_client(
     full_name: str | None,
     phone: str | None = None,
 ) -> Client:
-    client = await session.scalar(select(Client).where(Client.telegram_id == telegram_id))
-    if client:
-        # Обновляем данные только если они изменились
-        updated = False
-        if username and client.username != username:
-            client.username = username
-            updated = True
-        if full_name and client.full_name != full_name:
-            client.full_name = full_name
-            updated = True
-        if phone and client.phone_hash != phone:
-            client.phone_hash = phone
-            updated = True
-        if updated:
-            await session.commit()
+    """Создать клиента или обновить переданные поля профиля — одним запросом.
+
+    Коммит — только если строка вставлена или изменена; иначе пустая
+    транзакция откатывается (без записи) и клиент читается SELECT'ом.
+    """
+    stmt = _client_upsert(session, telegram_id, username, full_name, phone).returning(Client)
+    client = await session.scalar(stmt, execution_options={"populate_existing": True})
+    if client is not None:
+        await session.commit()
         return client
+    await session.rollback()
+    return await get_client_by_telegram_id(session, telegram_id)
 
-    client = Client(
-        telegram_id=telegram_id,
-        username=username,
-        full_name=full_name,
-        phone_hash=phone,
+
+def _profile_changed(current, username: str | None, full_name: str | None) -> bool:
+    """Отличается ли переданный профиль (пустые значения не считаются изменением)."""
+    return bool(
+        (username and current.username != username)
+        or (full_name and current.full_name != full_name)
     )
-    session.add(client)
-    await session.commit()
-    await session.refresh(client)
+
+
+async def ensure_client(
+    session: AsyncSession,
+    telegram_id: int,
+    username: str | None,
+    full_name: str | None,
+) -> Client:
+    """Клиент для read-only сценариев без ожидания коммита.
+
+    Новый клиент создаётся сразу, а смена username/full_name у существующего
+    уходит в write-behind буфер (app.db.write_behind).
+    """
+    client = await session.scalar(select(Client).where(Client.telegram_id == telegram_id))
+    if client is None:
+        return await get_or_create_client(session, telegram_id, username, full_name)
+    if _profile_changed(client, username, full_name):
+        if not queue_profile_refresh(telegram_id, username, full_name):
+            return await get_or_create_client(session, telegram_id, username, full_name)
     return client
 
 
+async def onboard_user(
+    session: AsyncSession,
+    telegram_id: int,
+    username: str | None,
+    full_name: str | None,
+) -> bool:
+    """/start: клиент + подписка в одной транзакции.
+
+    Одним SELECT проверяет, есть ли что менять; если клиент уже есть
+    с активной подпиской — ничего не пишет (смена профиля уходит
+    в write-behind буфер). Возвращает True, если транзакция была.
+    """
+    row = (
+        await session.execute(
+            select(Client.username, Client.full_name, Subscriber.is_active)
+            .outerjoin(Subscriber, Subscriber.telegram_id == Client.telegram_id)
+            .where(Client.telegram_id == telegram_id)
+        )
+    ).first()
+    if row is not None and row.is_active:
+        if not _profile_changed(row, username, full_name):
+            return False
+        if queue_profile_refresh(telegram_id, username, full_name):
+            return False
+
+    await session.execute(_client_upsert(session, telegram_id, username, full_name))
+    await session.execute(_subscriber_upsert(session, telegram_id, username, full_name))
+    await session.commit()
+    return True
+
+
+async def get_client_profile(session: AsyncSession, telegram_id: int):
+    """Только поля, нужные WebApp: visits, notes, username, full_name (без загрузки Client)."""
+    result = await session.execute(
+        select(Client.visits, Client.notes, Client.username, Client.full_name)
+        .where(Client.telegram_id == telegram_id)
+    )
+    return result.first()
+
+
 async def get_client_by_telegram_id(session: AsyncSession, telegram_id: int) -> Client | None:
     return await session.scalar(select(Client).where(Client.telegram_id == telegram_id))
 
@@ -69,6 +193,7 @@ async def add_promotion(
     promo = Promotion(title=title, description=description, image_url=image_url)
     session.add(promo)
     await session.commit()
+    invalidate_venue_snapshot()
     await session.refresh(promo)
     return promo
 
@@ -98,6 +223,7 @@ async def update_schedule(session: AsyncSession, text: str, defaults: tuple[str,
     settings.schedule_text = text
     settings.updated_at = datetime.now(tz=UTC).replace(tzinfo=None)
     await session.commit()
+    invalidate_venue_snapshot()
     await session.refresh(settings)
     return settings
 
@@ -107,6 +233,7 @@ async def update_contacts(session: AsyncSession, text: str, defaults: tuple[str,
     settings.contacts_text = text
     settings.updated_at = datetime.now(tz=UTC).replace(tzinfo=None)
     await session.commit()
+    invalidate_venue_snapshot()
     await session.refresh(settings)
     return settings
 
@@ -148,22 +275,10 @@ async def add_subscriber(
     username: str | None = None,
     full_name: str | None = None,
 ) -> Subscriber:
-    """Добавить подписчика или обновить существующего."""
-    subscriber = await session.scalar(select(Subscriber).where(Subscriber.telegram_id == telegram_id))
-    if subscriber:
-        if not subscriber.is_active:
-            subscriber.is_active = True
-            await session.commit()
-        return subscriber
-
-    subscriber = Subscriber(
-        telegram_id=telegram_id,
-        username=username,
-        full_name=full_name,
-    )
-    session.add(subscriber)
+    """Добавить подписчика или снова активировать существующего — одним запросом."""
+    stmt = _subscriber_upsert(session, telegram_id, username, full_name).returning(Subscriber)
+    subscriber = await session.scalar(stmt, execution_options={"populate_existing": True})
     await session.commit()
-    await session.refresh(subscriber)
     return subscriber
 
 
@@ -178,7 +293,7 @@ async def remove_subscriber(session: AsyncSession, telegram_id: int) -> bool:
 
 
 async def get_active_subscribers(session: AsyncSession) -> list[Subscriber]:
-    """Получить всех активных подписчиков."""
+    """Получить всех активных подписчиков (для рассылок — iter_active_subscribers)."""
     stmt = select(Subscriber).where(Subscriber.is_active.is_(True)).order_by(Subscriber.subscribed_at)
     return list((await session.scalars(stmt)).all())
 
@@ -199,6 +314,240 @@ async def update_last_mailed(session: AsyncSession, telegram_id: int) -> None:
     await session.commit()
 
 
+def _telegram_id_in(session: AsyncSession, column, telegram_ids: list[int]):
+    """Условие `column IN (...)`; для PostgreSQL — `= ANY(:ids)` одним параметром-массивом."""
+    if session.bind.dialect.name == "postgresql":
+        return column == any_(bindparam("telegram_ids", telegram_ids, type_=ARRAY(BigInteger)))
+    return column.in_(telegram_ids)
+
+
+async def mark_mailed(session: AsyncSession, telegram_ids: list[int]) -> None:
+    """Обновить время последней рассылки сразу для пачки подписчиков."""
+    if not telegram_ids:
+        return
+    await session.execute(
+        update(Subscriber)
+        .where(_telegram_id_in(session, Subscriber.telegram_id, telegram_ids))
+        .values(last_mailed_at=datetime.now(tz=UTC).replace(tzinfo=None))
+    )
+    await session.commit()
+
+
+async def deactivate_subscribers(session: AsyncSession, telegram_ids: list[int]) -> None:
+    """Отписать пачку пользователей, до которых рассылка больше не доходит."""
+    if not telegram_ids:
+        return
+    await session.execute(
+        update(Subscriber)
+        .where(_telegram_id_in(session, Subscriber.telegram_id, telegram_ids))
+        .values(is_active=False)
+    )
+    await session.commit()
+
+
+async def get_subscriber_chunk(session: AsyncSession, after_id: int, limit: int) -> list[tuple[int, int]]:
+    """Порция активных подписчиков (id, telegram_id) после `after_id`."""
+    stmt = (
+        select(Subscriber.id, Subscriber.telegram_id)
+        .where(Subscriber.is_active.is_(True), Subscriber.id > after_id)
+        .order_by(Subscriber.id)
+        .limit(limit)
+    )
+    return [(row.id, row.telegram_id) for row in await session.execute(stmt)]
+
+
+async def iter_active_subscribers(
+    session: AsyncSession,
+    batch_size: int = 500,
+    after_id: int = 0,
+) -> AsyncIterator[list[tuple[int, int]]]:
+    """Постранично выдавать активных подписчиков (id, telegram_id) по keyset `Subscriber.id`.
+
+    В памяти одновременно только одна страница. Между страницами транзакция
+    завершается, чтобы соединение не удерживалось, пока идёт отправка.
+    """
+    while True:
+        page = await get_subscriber_chunk(session, after_id, batch_size)
+        await session.commit()
+        if not page:
+            return
+        yield page
+        after_id = page[-1][0]
+
+
+# ==================== MEDIA CACHE ====================
+
+def _url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+async def get_cached_file_id(session: AsyncSession, url: str) -> str | None:
+    """file_id, полученный при прошлой отправке файла по этому URL."""
+    return await session.scalar(select(MediaCache.file_id).where(MediaCache.url_hash == _url_hash(url)))
+
+
+async def save_cached_file_id(session: AsyncSession, url: str, file_id: str) -> None:
+    url_hash = _url_hash(url)
+    entry = await session.scalar(select(MediaCache).where(MediaCache.url_hash == url_hash))
+    if entry:
+        entry.file_id = file_id
+    else:
+        session.add(MediaCache(url_hash=url_hash, url=url[:500], file_id=file_id))
+    await session.commit()
+
+
+# ==================== BROADCAST JOBS ====================
+
+async def create_broadcast_job(
+    session: AsyncSession,
+    text: str | None = None,
+    photo_url: str | None = None,
+    from_chat_id: int | None = None,
+    message_id: int | None = None,
+    created_by: int | None = None,
+) -> BroadcastJob:
+    """Поставить рассылку в очередь."""
+    job = BroadcastJob(
+        text=text,
+        photo_url=photo_url,
+        from_chat_id=from_chat_id,
+        message_id=message_id,
+        created_by=created_by,
+        total=await get_subscribers_count(session),
+    )
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
+async def get_broadcast_job(session: AsyncSession, job_id: int) -> BroadcastJob | None:
+    return await session.get(BroadcastJob, job_id, populate_existing=True)
+
+
+async def claim_broadcast_job(
+    session: AsyncSession,
+    worker_id: str,
+    stale_after: timedelta,
+) -> BroadcastJob | None:
+    """Взять в работу новое задание или брошенное упавшим воркером."""
+    now = datetime.now(tz=UTC).replace(tzinfo=None)
+    claimable = or_(
+        BroadcastJob.status == "queued",
+        and_(
+            BroadcastJob.status == "running",
+            or_(BroadcastJob.heartbeat_at.is_(None), BroadcastJob.heartbeat_at < now - stale_after),
+        ),
+    )
+    job_id = await session.scalar(select(BroadcastJob.id).where(claimable).order_by(BroadcastJob.id).limit(1))
+    if job_id is None:
+        return None
+    result = await session.execute(
+        update(BroadcastJob)
+        .where(BroadcastJob.id == job_id, claimable)
+        .values(status="running", worker_id=worker_id, heartbeat_at=now)
+    )
+    await session.commit()
+    if result.rowcount != 1:
+        return None  # Задание перехватил другой воркер
+    return await get_broadcast_job(session, job_id)
+
+
+async def reserve_deliveries(session: AsyncSession, job_id: int, telegram_ids: list[int]) -> list[int]:
+    """Записать доставки порции до отправки. Возвращает тех, кому задание ещё не отправлялось."""
+    existing = set(
+        await session.scalars(
+            select(BroadcastDelivery.telegram_id).where(
+                BroadcastDelivery.job_id == job_id,
+                _telegram_id_in(session, BroadcastDelivery.telegram_id, telegram_ids),
+            )
+        )
+    )
+    fresh = [telegram_id for telegram_id in telegram_ids if telegram_id not in existing]
+    if fresh:
+        now = datetime.now(tz=UTC).replace(tzinfo=None)
+        await session.execute(
+            insert(BroadcastDelivery),
+            [{"job_id": job_id, "telegram_id": telegram_id, "updated_at": now} for telegram_id in fresh],
+        )
+    await session.commit()
+    return fresh
+
+
+async def checkpoint_broadcast_job(
+    session: AsyncSession,
+    job_id: int,
+    cursor: int,
+    sent_ids: list[int],
+    failed_ids: list[int],
+) -> None:
+    """Зафиксировать итог порции и сдвинуть курсор задания."""
+    now = datetime.now(tz=UTC).replace(tzinfo=None)
+    for status, telegram_ids in (("sent", sent_ids), ("failed", failed_ids)):
+        if telegram_ids:
+            await session.execute(
+                update(BroadcastDelivery)
+                .where(
+                    BroadcastDelivery.job_id == job_id,
+                    _telegram_id_in(session, BroadcastDelivery.telegram_id, telegram_ids),
+                )
+                .values(status=status, updated_at=now)
+            )
+    await session.execute(
+        update(BroadcastJob)
+        .where(BroadcastJob.id == job_id)
+        .values(
+            cursor=cursor,
+            sent=BroadcastJob.sent + len(sent_ids),
+            failed=BroadcastJob.failed + len(failed_ids),
+            heartbeat_at=now,
+        )
+    )
+    await session.commit()
+
+
+async def heartbeat_broadcast_job(session: AsyncSession, job_id: int, worker_id: str) -> None:
+    """Продлить владение заданием, пока порция ещё отправляется."""
+    await session.execute(
+        update(BroadcastJob)
+        .where(BroadcastJob.id == job_id, BroadcastJob.worker_id == worker_id)
+        .values(heartbeat_at=datetime.now(tz=UTC).replace(tzinfo=None))
+    )
+    await session.commit()
+
+
+async def release_broadcast_job(session: AsyncSession, job_id: int, unsent_ids: list[int] | None = None) -> None:
+    """Вернуть задание в очередь (остановка воркера).
+
+    `unsent_ids` — зарезервированные, но не начатые отправки: их записи
+    удаляются, и после возобновления они будут отправлены. Записи, оставшиеся
+    в pending после падения процесса, не повторяются (сообщение могло уйти).
+    """
+    if unsent_ids:
+        await session.execute(
+            delete(BroadcastDelivery).where(
+                BroadcastDelivery.job_id == job_id,
+                BroadcastDelivery.status == "pending",
+                _telegram_id_in(session, BroadcastDelivery.telegram_id, unsent_ids),
+            )
+        )
+    await session.execute(
+        update(BroadcastJob).where(BroadcastJob.id == job_id).values(status="queued", worker_id=None)
+    )
+    await session.commit()
+
+
+async def finish_broadcast_job(session: AsyncSession, job_id: int) -> BroadcastJob | None:
+    """Отметить задание завершённым."""
+    await session.execute(
+        update(BroadcastJob)
+        .where(BroadcastJob.id == job_id)
+        .values(status="done", finished_at=datetime.now(tz=UTC).replace(tzinfo=None))
+    )
+    await session.commit()
+    return await get_broadcast_job(session, job_id)
+
+
 # ==================== DYNAMIC ADMINS ====================
 
 async def add_dynamic_admin(session: AsyncSession, telegram_id: int) -> DynamicAdmin | None:
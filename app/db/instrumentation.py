@@ -0,0 +1,99 @@
+"""Инструментирование SQL: задержки запросов, счётчики на запрос/апдейт, медленные запросы.
+
+Хуки событий движка пишут в app.metrics:
+- db.statement_ms — все запросы;
+- db.query_ms[<модуль>:<функция>] — по месту вызова (обычно функция crud);
+- db.statements_per_request / db.statements_per_update — сколько запросов
+  сделал один HTTP-запрос или один апдейт Telegram (см. track_statements).
+Запросы дольше порога пишутся в лог вместе с местом вызова.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+
+import greenlet
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = str(Path(__file__).resolve().parent.parent)
+_PROJECT_DIR = str(Path(_APP_DIR).parent)
+# Обёртки над сессией — не место вызова
+_SKIP_FILES = {__file__, str(Path(__file__).with_name("sqlite.py"))}
+
+
+@dataclass
+class StatementCounter:
+    count: int = 0
+    time_ms: float = 0.0
+
+
+_scope: ContextVar[StatementCounter | None] = ContextVar("db_statements", default=None)
+
+
+@contextmanager
+def track_statements(kind: str) -> Iterator[StatementCounter]:
+    """Считать SQL-запросы внутри одного HTTP-запроса ("request") или апдейта ("update")."""
+    counter = StatementCounter()
+    token = _scope.set(counter)
+    try:
+        yield counter
+    finally:
+        _scope.reset(token)
+        metrics = get_metrics()
+        metrics.observe(f"db.statements_per_{kind}", counter.count)
+        metrics.observe(f"db.time_per_{kind}_ms", counter.time_ms)
+
+
+def _call_site() -> str:
+    """Первый кадр кода приложения, выполнившего запрос.
+
+    Async-сессия выполняет запрос в дочернем greenlet, поэтому стек
+    вызывающей корутины берём из родительского greenlet.
+    """
+    current = greenlet.getcurrent()
+    frame = current.parent.gr_frame if current.parent is not None else None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and filename not in _SKIP_FILES:
+            module = filename[len(_PROJECT_DIR) + 1:].removesuffix(".py").replace("/", ".")
+            return f"{module}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def instrument_engine(engine: AsyncEngine, slow_query_ms: float) -> None:
+    metrics = get_metrics()
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        context._filin_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed_ms = (time.perf_counter() - context._filin_started) * 1000
+        site = _call_site()
+        metrics.observe("db.statement_ms", elapsed_ms)
+        metrics.observe(f"db.query_ms[{site}]", elapsed_ms)
+
+        counter = _scope.get()
+        if counter is not None:
+            counter.count += 1
+            counter.time_ms += elapsed_ms
+
+        if elapsed_ms >= slow_query_ms:
+            logger.warning(
+                "Slow query %.1f ms at %s: %s",
+                elapsed_ms,
+                site,
+                " ".join(statement.split())[:500],
+            )
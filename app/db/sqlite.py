@@ -0,0 +1,99 @@
+"""Профиль SQLite для продакшена (docker-compose: webapp и бот на одном filin.db).
+
+WAL позволяет читать параллельно с записью, busy_timeout заставляет
+ждать блокировку вместо мгновенного "database is locked", а пишущие
+транзакции внутри процесса выстраиваются в очередь на asyncio.Lock,
+чтобы не соревноваться за блокировку файла друг с другом.
+"""
+from __future__ import annotations
+
+import asyncio
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session, SessionTransaction
+from sqlalchemy.util import await_only
+
+from app.config import Settings, get_settings
+
+# Один писатель на процесс; между процессами ждёт busy_timeout
+_write_lock = asyncio.Lock()
+
+
+def install_pragmas(engine: AsyncEngine, settings: Settings) -> None:
+    """Выставлять PRAGMA на каждом новом соединении пула."""
+    pragmas = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",  # В режиме WAL безопасно и без fsync на каждый коммит
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        f"PRAGMA cache_size={settings.sqlite_cache_size}",
+        "PRAGMA temp_store=MEMORY",
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+class _WriteLockedSession(Session):
+    """Sync-часть SQLiteSession; флаг — держит ли сессия lock записи."""
+
+    holds_write_lock = False
+
+
+def _acquire_write_lock(session: _WriteLockedSession) -> None:
+    if session.holds_write_lock:
+        return
+    # Сначала соединение, потом lock: владелец lock не ждёт свободного
+    # соединения из пула, занятого теми, кто ждёт lock
+    session.connection()
+    await_only(_wait_write_lock())
+    session.holds_write_lock = True
+
+
+async def _wait_write_lock() -> None:
+    timeout = get_settings().sqlite_busy_timeout_ms / 1000
+    try:
+        # asyncio.timeout, а не wait_for: в 3.11 wait_for может взять lock и всё же
+        # выбросить TimeoutError, и lock останется занятым навсегда
+        async with asyncio.timeout(timeout):
+            await _write_lock.acquire()
+    except TimeoutError:
+        # Как SQLITE_BUSY: например, вторая пишущая сессия в той же задаче
+        raise TimeoutError(f"SQLite write lock not acquired in {timeout:g}s") from None
+
+
+@event.listens_for(_WriteLockedSession, "before_flush")
+def _lock_before_flush(session: _WriteLockedSession, flush_context, instances) -> None:
+    # Любой flush с изменениями: явный, commit и autoflush из get/refresh/execute
+    _acquire_write_lock(session)
+
+
+@event.listens_for(_WriteLockedSession, "do_orm_execute")
+def _lock_before_dml(orm_execute_state: ORMExecuteState) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _acquire_write_lock(orm_execute_state.session)
+
+
+@event.listens_for(_WriteLockedSession, "after_transaction_end")
+def _release_write_lock(session: _WriteLockedSession, transaction: SessionTransaction) -> None:
+    # Commit, rollback или close внешней транзакции (не SAVEPOINT)
+    if transaction.parent is None and session.holds_write_lock:
+        session.holds_write_lock = False
+        _write_lock.release()
+
+
+class SQLiteSession(AsyncSession):
+    """AsyncSession, которая берёт общий lock процесса перед первой записью.
+
+    Lock берётся в событиях sync-сессии (flush с изменениями, DML через
+    execute) и держится до конца транзакции: SQLite всё равно допускает
+    только одного писателя, а так транзакции ждут друг друга в event loop,
+    не упираясь в SQLITE_BUSY. Ожидание ограничено busy_timeout.
+    """
+
+    sync_session_class = _WriteLockedSession
@@ -0,0 +1,119 @@
+"""Отложенная запись обновлений профиля клиентов (write-behind).
+
+Смена username/full_name, замеченная в read-only сценариях (bootstrap,
+/start, лояльность), не коммитится сразу, а копится в памяти по
+telegram_id (побеждает последнее значение) и раз в несколько секунд
+записывается одним пакетным UPDATE. Буфер сбрасывается и при остановке.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.models import Client
+
+logger = logging.getLogger(__name__)
+
+_writer: ProfileWriteBehind | None = None
+
+_clients = Client.__table__
+_update_profile = (
+    update(_clients)
+    .where(_clients.c.telegram_id == bindparam("b_telegram_id"))
+    .values(
+        # NULL — поле не менялось, оставляем как есть
+        username=func.coalesce(bindparam("b_username"), _clients.c.username),
+        full_name=func.coalesce(bindparam("b_full_name"), _clients.c.full_name),
+    )
+)
+
+
+class ProfileWriteBehind:
+    def __init__(self, session_factory: async_sessionmaker, interval: float = 5.0) -> None:
+        self.session_factory = session_factory
+        self.interval = interval
+        self._pending: dict[int, tuple[str | None, str | None]] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def queue(self, telegram_id: int, username: str | None, full_name: str | None) -> None:
+        """Запомнить новый профиль; пустые поля не затирают ранее поставленные."""
+        old_username, old_full_name = self._pending.get(telegram_id, (None, None))
+        self._pending[telegram_id] = (username or old_username, full_name or old_full_name)
+
+    async def flush(self) -> int:
+        """Записать накопленное одним executemany UPDATE; вернуть число клиентов."""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        params = [
+            {"b_telegram_id": telegram_id, "b_username": username, "b_full_name": full_name}
+            for telegram_id, (username, full_name) in batch.items()
+        ]
+        try:
+            async with self.session_factory() as session:
+                await session.execute(_update_profile, params)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Profile flush failed ({len(batch)} clients): {e}")
+            self._requeue(batch)
+            return 0
+        except BaseException:
+            # Отмена (stop() во время периодической записи): пачку сбросит финальный flush
+            self._requeue(batch)
+            raise
+        return len(batch)
+
+    def _requeue(self, batch: dict[int, tuple[str | None, str | None]]) -> None:
+        """Вернуть пачку в буфер, не затирая то, что пришло за время записи."""
+        for telegram_id, (username, full_name) in batch.items():
+            newer_username, newer_full_name = self._pending.get(telegram_id, (None, None))
+            self._pending[telegram_id] = (newer_username or username, newer_full_name or full_name)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+
+def start_profile_writer(session_factory: async_sessionmaker, interval: float = 5.0) -> ProfileWriteBehind:
+    """Запустить периодическую запись профилей в текущем процессе."""
+    global _writer
+    _writer = ProfileWriteBehind(session_factory, interval)
+    _writer.start()
+    return _writer
+
+
+async def stop_profile_writer() -> None:
+    """Остановить и записать всё накопленное."""
+    global _writer
+    if _writer:
+        await _writer.stop()
+        _writer = None
+
+
+def queue_profile_refresh(telegram_id: int, username: str | None, full_name: str | None) -> bool:
+    """Отложить обновление профиля. False — буфер не запущен, писать нужно сразу."""
+    if _writer is None:
+        return False
+    _writer.queue(telegram_id, username, full_name)
+    return True
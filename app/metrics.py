@@ -0,0 +1,92 @@
+"""Метрики процесса в памяти: гистограммы задержек, счётчики и gauges.
+
+Гистограммы с фиксированными корзинами: запись — O(число корзин) без
+хранения отдельных значений, квантили оцениваются по верхней границе
+корзины. Снимок отдаётся через /api/admin/metrics.
+"""
+from __future__ import annotations
+
+import bisect
+from functools import lru_cache
+
+# Верхние границы корзин (для задержек — миллисекунды)
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя — всё, что больше границ
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля: верхняя граница корзины, в которую он попадает."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "avg": round(self.sum / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self.gauges: dict[str, int] = {}
+
+    def histogram(self, name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(buckets)
+        return histogram
+
+    def observe(self, name: str, value: float) -> None:
+        self.histogram(name).observe(value)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge_add(self, name: str, delta: int) -> None:
+        """Текущее значение, которое может убывать (например, запросов в работе)."""
+        self.gauges[name] = self.gauges.get(name, 0) + delta
+
+    def snapshot(self) -> dict:
+        return {
+            "histograms": {name: h.snapshot() for name, h in sorted(self.histograms.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": dict(sorted(self.gauges.items())),
+        }
+
+    def reset(self) -> None:
+        self.histograms.clear()
+        self.counters.clear()
+        self.gauges.clear()
+
+
+@lru_cache(maxsize=1)
+def get_metrics() -> MetricsRegistry:
+    """Общий реестр метрик процесса."""
+    return MetricsRegistry()
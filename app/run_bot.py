@@ -5,18 +5,22 @@ import logging
 import os
 
 from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
 from aiogram.types import BotCommand, MenuButtonWebApp, WebAppInfo
 
+from app.bot.broadcast_worker import start_broadcast_worker, stop_broadcast_worker
+from app.bot.dispatcher import close_bot, get_bot
 from app.bot.handlers.admin import register_admin_handlers
 from app.bot.handlers.admin_dashboard import register_admin_dashboard
 from app.bot.handlers.booking_actions import register_booking_actions
 from app.bot.handlers.common import register_common_handlers
 from app.bot.handlers.webapp import register_webapp_handlers
-from app.bot.middlewares.rate_limit import RateLimitMiddleware
+from app.bot.middleware.db_statements import DbStatementsMiddleware
+from app.bot.middleware.handler_metrics import setup_handler_metrics
+from app.bot.middleware.rate_limit import create_rate_limiter
 from app.bot.scheduler import setup_scheduler
 from app.config import get_settings
 from app.db.base import init_db, session_factory
+from app.db.write_behind import start_profile_writer, stop_profile_writer
 from app.logging import get_logger
 from app.logging_config import setup_logging
 
@@ -52,6 +56,7 @@ async def set_webhook(bot: Bot, webhook_url: str) -> None:
     await bot.set_webhook(
         url=webhook_url,
         allowed_updates=["message", "callback_query", "pre_checkout_query"],
+        secret_token=get_settings().webhook_secret or None,
     )
     logger.info("Webhook set to: %s", webhook_url)
     await set_bot_commands(bot)
@@ -83,14 +88,13 @@ async def run_polling() -> None:
     logger.info("Динамические админы загружены: %s", ids)
 
     logger.info("Создание бота...")
-    bot = Bot(
-        token=settings.bot_token,
-        default=DefaultBotProperties(parse_mode="HTML"),
-    )
+    bot = get_bot()
     
     dp = Dispatcher()
-    dp.message.middleware(RateLimitMiddleware())
-    dp.callback_query.middleware(RateLimitMiddleware())
+    dp.update.outer_middleware(DbStatementsMiddleware())
+    rate_limiter = create_rate_limiter(settings)
+    rate_limiter.setup(dp)
+    setup_handler_metrics(dp)  # Последним: inner-часть — перед самим хендлером
 
     logger.info("Регистрация обработчиков...")
     dp.include_router(register_common_handlers(session_factory, settings))
@@ -100,6 +104,10 @@ async def run_polling() -> None:
     dp.include_router(register_admin_handlers(session_factory, settings))
 
     scheduler = setup_scheduler(bot, session_factory)
+    if settings.broadcast_worker_in_bot:
+        # Без процесса webapp рассылки выполняет бот (прогресс — только в логах)
+        start_broadcast_worker(bot, session_factory)
+    start_profile_writer(session_factory, settings.profile_flush_interval)
 
     bot_me = await bot.get_me()
     logger.info(f"Запуск polling для бота @{bot_me.username}...")
@@ -113,7 +121,10 @@ async def run_polling() -> None:
         raise
     finally:
         scheduler.shutdown(wait=False)
-        await bot.session.close()
+        await stop_broadcast_worker()
+        await stop_profile_writer()
+        await rate_limiter.close()
+        await close_bot()
         logger.info("Бот остановлен")
 
 
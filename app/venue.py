@@ -0,0 +1,66 @@
+"""Общий для всех пользователей снапшот заведения для /api/bootstrap.
+
+Расписание, контакты, акции и меню собираются один раз и хранятся уже
+сериализованными; на запрос к ним дописываются только данные пользователя.
+crud сбрасывает снапшот при изменении настроек и акций. TTL остаётся
+страховкой для изменений, сделанных другим процессом (бот в режиме polling);
+после его истечения старый снапшот ещё отдаётся, пока собирается новый.
+"""
+from __future__ import annotations
+
+import hashlib
+from functools import lru_cache
+from typing import NamedTuple
+
+import orjson
+
+from app.cache import Loader, TTLCache
+from app.config import get_settings
+
+_KEY = "venue"
+_version = 0
+
+
+class VenueSnapshot(NamedTuple):
+    version: str  # Для ETag: номер инвалидации до загрузки + хэш содержимого
+    body: bytes
+
+
+@lru_cache(maxsize=1)
+def _snapshot_cache() -> TTLCache:
+    settings = get_settings()
+    return TTLCache(ttl=settings.webapp_cache_ttl, max_entries=1, stale_ttl=settings.webapp_cache_stale_ttl)
+
+
+def venue_version() -> int:
+    """Номер инвалидации снапшота; растёт при каждом изменении через crud."""
+    return _version
+
+
+async def get_venue_snapshot(loader: Loader) -> VenueSnapshot:
+    """Снапшот из кэша; при промахе одновременные запросы ждут одну загрузку."""
+
+    async def load() -> VenueSnapshot:
+        # Версия фиксируется до загрузки и хранится вместе с байтами: загрузка,
+        # начатая до записи, не получит номер, выданный уже после неё.
+        # Хэш содержимого отличает пересборку по TTL с изменениями из другого процесса
+        version = _version
+        data = await loader()
+        digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+        return VenueSnapshot(f"{version}.{digest}", data)
+
+    return await _snapshot_cache().get_or_load(_KEY, load)
+
+
+def invalidate_venue_snapshot() -> None:
+    global _version
+    _version += 1
+    _snapshot_cache().invalidate(_KEY)
+
+
+def merge_snapshot(snapshot: bytes, delta: dict) -> bytes:
+    """Дописать поля `delta` в сериализованный JSON-объект снапшота."""
+    if not delta:
+        return snapshot
+    extra = orjson.dumps(delta)
+    return snapshot[:-1] + b"," + extra[1:]
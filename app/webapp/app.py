@@ -3,29 +3,37 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
-from datetime import datetime
 from pathlib import Path
-from typing import Dict, Set
+from typing import Set
 
+import orjson
 from fastapi import Depends, FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, Field
 from sqlalchemy import desc, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from app.bot.broadcast_worker import start_broadcast_worker, stop_broadcast_worker, wake_broadcast_worker
 from app.config import get_settings
 from app.db import crud
 from app.db.base import get_session
+from app.db.instrumentation import track_statements
 from app.db.models import Client, Promotion, Subscriber
+from app.db.write_behind import queue_profile_refresh, start_profile_writer, stop_profile_writer
+from app.metrics import get_metrics
+from app.venue import get_venue_snapshot, merge_snapshot
+from app.webapp.etag import conditional_json, make_etag
 
 print(">>> BUILD 2026-03-05 (Informational WebApp) <<<", flush=True)
 
 BASE_DIR = Path(__file__).resolve().parent
 
-app = FastAPI(title="Filin WebApp")
+# orjson вместо stdlib json для всех ответов-словарей
+app = FastAPI(title="Filin WebApp", default_response_class=ORJSONResponse)
 
 # CORS для Telegram WebApp
 app.add_middleware(
@@ -36,6 +44,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+class StatementCountMiddleware:
+    """Число SQL-запросов на один HTTP-запрос (см. /api/admin/metrics).
+
+    Чистый ASGI: без BaseHTTPMiddleware, который гоняет тело ответа через
+    отдельную задачу и поток памяти на каждом запросе.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_statements("request"):
+            await self.app(scope, receive, send)
+
+
+app.add_middleware(StatementCountMiddleware)
+
 app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
@@ -70,7 +99,7 @@ class ConnectionManager:
         if not connections:
             return
 
-        message_text = json.dumps(message)
+        message_text = orjson.dumps(message).decode()
         disconnected = set()
 
         for conn in connections:
@@ -85,36 +114,6 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
-# ==================== CACHE ====================
-class SimpleCache:
-    """Простое кэширование для оптимизации."""
-
-    def __init__(self, ttl_seconds: int = 60):
-        self._cache: Dict[str, tuple] = {}
-        self._ttl = ttl_seconds
-
-    def get(self, key: str):
-        if key in self._cache:
-            value, timestamp = self._cache[key]
-            if datetime.utcnow().timestamp() - timestamp < self._ttl:
-                return value
-            del self._cache[key]
-        return None
-
-    def set(self, key: str, value):
-        self._cache[key] = (value, datetime.utcnow().timestamp())
-
-    def invalidate(self, key: str):
-        if key in self._cache:
-            del self._cache[key]
-
-    def invalidate_pattern(self, pattern: str):
-        for key in list(self._cache.keys()):
-            if key.startswith(pattern):
-                del self._cache[key]
-
-cache = SimpleCache(ttl_seconds=30)
-
 # ==================== PYDANTIC MODELS ====================
 
 class CreateReviewRequest(BaseModel):
@@ -152,30 +151,21 @@ async def webapp_index(request: Request) -> HTMLResponse:
 
 # ==================== CLIENT API ====================
 
-@app.get("/api/bootstrap")
-async def bootstrap(
-    telegram_id: int = Query(ge=1),
-    username: str | None = Query(default=None),
-    full_name: str | None = Query(default=None),
-    session: AsyncSession = Depends(get_session),
-) -> dict:
-    cache_key = f"bootstrap:{telegram_id}"
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
-
-    client = await crud.get_or_create_client(
-        session=session,
-        telegram_id=telegram_id,
-        username=username,
-        full_name=full_name,
-    )
-    venue = await crud.get_venue_settings(
-        session=session,
-        default_schedule="Ежедневно с 14:00 до 2:00",
-        default_contacts="📞 7-950-433-34-34\n🌙 Твой идеальный вечер",
-    )
-    promotions = await crud.get_active_promotions(session)
+async def _build_venue_payload() -> bytes:
+    """Общая для всех часть /api/bootstrap (собирается один раз до изменения данных).
+
+    Работает в своей сессии: загрузку могут ждать несколько запросов,
+    а фоновое обновление переживает запрос, который его запустил.
+    """
+    from app.db.base import session_factory
+
+    async with session_factory() as session:
+        venue = await crud.get_venue_settings(
+            session=session,
+            default_schedule="Ежедневно с 14:00 до 2:00",
+            default_contacts="📞 7-950-433-34-34\n🌙 Твой идеальный вечер",
+        )
+        promotions = await crud.get_active_promotions(session)
 
     default_promo = {
         "id": 0,
@@ -192,11 +182,9 @@ async def bootstrap(
 
     promo_payload = [default_promo] + other_promos
 
-    result = {
+    payload = {
         "schedule": "Ежедневно с 14:00 до 2:00",
         "contacts": venue.contacts_text,
-        "visits": client.visits,
-        "notes": client.notes,
         "promotions": promo_payload,
         "menu": [
             {"title": "Классический кальян", "description": "1200 рублей"},
@@ -205,8 +193,37 @@ async def bootstrap(
         "loyalty_rule": "При заказе 5-го кальяна - скидка 50%, при заказе 10-го - бесплатно.",
     }
 
-    cache.set(cache_key, result)
-    return result
+    return orjson.dumps(payload)
+
+
+@app.get("/api/bootstrap")
+async def bootstrap(
+    request: Request,
+    telegram_id: int = Query(ge=1),
+    username: str | None = Query(default=None),
+    full_name: str | None = Query(default=None),
+    session: AsyncSession = Depends(get_session),
+) -> Response:
+    profile = await crud.get_client_profile(session, telegram_id)
+    changed = profile is not None and (
+        (username and profile.username != username)
+        or (full_name and profile.full_name != full_name)
+    )
+    if profile is None or (changed and not queue_profile_refresh(telegram_id, username, full_name)):
+        # Новый клиент (или буфер профилей не запущен) — пишем сразу
+        client = await crud.get_or_create_client(
+            session=session,
+            telegram_id=telegram_id,
+            username=username,
+            full_name=full_name,
+        )
+        visits, notes = client.visits, client.notes
+    else:
+        visits, notes = profile.visits, profile.notes
+
+    venue = await get_venue_snapshot(_build_venue_payload)
+    etag = make_etag("bootstrap", venue.version, telegram_id, visits, notes)
+    return conditional_json(request, etag, lambda: merge_snapshot(venue.body, {"visits": visits, "notes": notes}))
 
 
 @app.post("/api/reviews")
@@ -225,60 +242,50 @@ async def create_review(
 
 @app.get("/api/admin/stats")
 async def admin_stats(session: AsyncSession = Depends(get_session)):
-    stats = await crud.get_today_stats(session)
-    return stats
+    # Без ETag: он считался бы от готового тела, а 304 не экономит ни запрос, ни сериализацию
+    return await crud.get_today_stats(session)
+
+
+@app.get("/api/admin/metrics")
+async def admin_metrics() -> dict:
+    """Метрики процесса: SQL (по месту вызова, на HTTP-запрос/апдейт) и хендлеры бота."""
+    return get_metrics().snapshot()
 
 
 # ==================== BROADCAST API ====================
 
 @app.get("/api/admin/broadcast/subscribers")
-async def get_subscribers_count(session: AsyncSession = Depends(get_session)):
+async def get_subscribers_count(request: Request, session: AsyncSession = Depends(get_session)) -> Response:
     count = await crud.get_subscribers_count(session)
-    return {"subscribers_count": count}
+    return conditional_json(
+        request,
+        make_etag("subscribers", count),
+        lambda: orjson.dumps({"subscribers_count": count}),
+    )
 
 
-@app.post("/api/admin/broadcast")
+@app.post("/api/admin/broadcast", status_code=202)
 async def broadcast_message(
     payload: BroadcastRequest,
     session: AsyncSession = Depends(get_session),
-) -> dict[str, int]:
-    """Отправить рассылку всем активным подписчикам."""
-    from aiogram import Bot
-
-    bot = Bot(token=settings.bot_token)
-    subscribers = await crud.get_active_subscribers(session)
-
-    success_count = 0
-    fail_count = 0
+) -> dict:
+    """Поставить рассылку в очередь. Отправку выполняет фоновый воркер."""
+    job = await crud.create_broadcast_job(session, text=payload.message, photo_url=payload.photo_url)
+    wake_broadcast_worker()
+    return {"job_id": job.id, "status": job.status, "total": job.total}
 
-    for sub in subscribers:
-        try:
-            if payload.photo_url:
-                await bot.send_photo(
-                    chat_id=sub.telegram_id,
-                    photo=payload.photo_url,
-                    caption=payload.message,
-                    parse_mode="HTML",
-                )
-            else:
-                await bot.send_message(
-                    chat_id=sub.telegram_id,
-                    text=payload.message,
-                    parse_mode="HTML",
-                )
-            await crud.update_last_mailed(session, sub.telegram_id)
-            success_count += 1
-        except Exception as e:
-            logger.error(f"Failed to send to {sub.telegram_id}: {e}")
-            fail_count += 1
-        await asyncio.sleep(0.05)  # Anti-flood
-
-    await bot.session.close()
 
+@app.get("/api/admin/broadcast/{job_id}")
+async def broadcast_status(job_id: int, session: AsyncSession = Depends(get_session)) -> dict:
+    job = await crud.get_broadcast_job(session, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast job not found")
     return {
-        "sent": success_count,
-        "failed": fail_count,
-        "total": len(subscribers),
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "sent": job.sent,
+        "failed": job.failed,
     }
 
 
@@ -313,7 +320,10 @@ async def admin_panel():
 
 # ==================== TELEGRAM WEBHOOK ====================
 
-from app.bot.dispatcher import get_bot, get_dispatcher
+from app.bot.dispatcher import close_bot, get_bot, get_dispatcher, get_handled_update_types, is_rate_limited
+from app.bot.update_dedup import get_update_dedup
+from app.bot.webhook_filter import parse_webhook, secret_matches
+from app.bot.webhook_queue import get_webhook_queue, start_webhook_queue, stop_webhook_queue
 
 _webhook_bot = get_bot()
 _webhook_dp = get_dispatcher()
@@ -344,6 +354,12 @@ async def on_startup():
     except Exception as e:
         logger.warning("Could not load dynamic admins: %s", e)
 
+    # Воркер рассылок (продолжит незавершённые задания после рестарта);
+    # прогресс уходит в админ-панель через /ws/admin
+    start_broadcast_worker(_webhook_bot, session_factory, on_progress=manager.broadcast)
+    start_profile_writer(session_factory, settings.profile_flush_interval)
+    start_webhook_queue(_webhook_bot, _webhook_dp, settings.webhook_workers, settings.webhook_queue_size)
+
     # Установка webhook
     webapp_url = os.getenv("RENDER_EXTERNAL_URL") or os.getenv("WEBAPP_URL", "https://filinhookah-1.onrender.com")
     base_url = webapp_url.replace("/webapp", "") if webapp_url.endswith("/webapp") else webapp_url
@@ -355,6 +371,7 @@ async def on_startup():
         await _webhook_bot.set_webhook(
             url=webhook_url,
             allowed_updates=["message", "callback_query", "pre_checkout_query"],
+            secret_token=settings.webhook_secret or None,
         )
         logger.info("Webhook set successfully!")
 
@@ -373,8 +390,14 @@ async def on_startup():
 @app.on_event("shutdown")
 async def on_shutdown():
     """Закрыть бота и соединения при остановке."""
+    logger.info("Draining webhook queue...")
+    await stop_webhook_queue()
+    logger.info("Stopping broadcast worker...")
+    await stop_broadcast_worker()
+    logger.info("Flushing profile updates...")
+    await stop_profile_writer()
     logger.info("Closing bot session...")
-    await _webhook_bot.session.close()
+    await close_bot()
     logger.info("Disposing database engine...")
     from app.db.base import dispose_engine
     await dispose_engine()
@@ -382,19 +405,48 @@ async def on_shutdown():
 
 
 @app.post("/api/telegram/webhook")
-async def telegram_webhook(request: Request) -> dict:
-    """Обработка обновлений от Telegram."""
+async def telegram_webhook(request: Request) -> Response:
+    """Приём апдейта от Telegram: проверить, поставить в очередь и сразу ответить.
+
+    До полной валидации Update отсекаются чужие запросы, повторы, апдейты
+    без обработчиков и апдейты, которые всё равно отбросит rate limiter.
+    """
     from aiogram.types import Update
 
-    try:
-        update_data = await request.json()
-        update = Update.model_validate(update_data)
+    if not secret_matches(request.headers.get("x-telegram-bot-api-secret-token"), settings.webhook_secret):
+        return ORJSONResponse({"ok": False, "error": "forbidden"}, status_code=403)
+
+    envelope = parse_webhook(await request.body())
+    if envelope is None:
+        # Повтор того же тела не поможет — подтверждаем, чтобы Telegram не ретраил
+        logger.error("Invalid webhook body")
+        return ORJSONResponse({"ok": False, "error": "invalid update"})
 
-        result = await _webhook_dp.feed_update(_webhook_bot, update)
+    dedup = get_update_dedup()
+    if dedup.check_and_remember(envelope.update_id):
+        return ORJSONResponse({"ok": True, "duplicate": True})
+    if envelope.update_type not in get_handled_update_types():
+        return ORJSONResponse({"ok": True, "skipped": "unhandled"})
+    if await is_rate_limited(envelope.update_type, envelope.sender_id):
+        return ORJSONResponse({"ok": True, "skipped": "rate limited"})
 
-        return {"ok": True}
+    try:
+        update = Update.model_validate(envelope.data, context={"bot": _webhook_bot})
     except Exception as e:
-        logger.error(f"Webhook error: {e}")
-        import traceback
-        traceback.print_exc()
-        return {"ok": False, "error": str(e)}
+        logger.error(f"Invalid webhook update: {e}")
+        return ORJSONResponse({"ok": False, "error": "invalid update"})
+
+    queue = get_webhook_queue()
+    if queue is None:
+        # Очередь не запущена (старт ещё не завершён) — обрабатываем сразу
+        try:
+            await _webhook_dp.feed_update(_webhook_bot, update)
+        except Exception:
+            dedup.forget(update.update_id)  # Telegram повторит — обработаем заново
+            raise
+    elif not queue.enqueue(update):
+        # Очередь переполнена: Telegram повторит доставку позже
+        dedup.forget(update.update_id)
+        logger.warning(f"Webhook queue full, update {update.update_id} deferred")
+        return ORJSONResponse({"ok": False, "error": "queue full"}, status_code=503)
+    return ORJSONResponse({"ok": True})
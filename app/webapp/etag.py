@@ -0,0 +1,45 @@
+"""Условные GET-запросы: ETag из версий данных, ответ 304 без тела."""
+from __future__ import annotations
+
+import hashlib
+import secrets
+from collections.abc import Callable
+
+from fastapi import Request, Response
+
+# Версии живут в памяти процесса: после рестарта все ETag меняются
+_BOOT_ID = secrets.token_hex(4)
+
+# Клиент хранит ответ, но перед использованием всегда переспрашивает сервер
+REVALIDATE = "private, no-cache"
+
+
+def make_etag(*parts: object) -> str:
+    """Слабый ETag из версий/значений, от которых зависит ответ."""
+    key = "|".join(str(part) for part in (_BOOT_ID, *parts))
+    return f'W/"{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Сравнение слабое: W/ не учитываем (RFC 9110, 13.1.2)
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def conditional_json(
+    request: Request,
+    etag: str,
+    body: Callable[[], bytes],
+    cache_control: str = REVALIDATE,
+) -> Response:
+    """304, если у клиента актуальная версия, иначе JSON из `body()`.
+
+    Тело собирается только при несовпадении ETag.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body(), media_type="application/json", headers=headers)
@@ -46,6 +46,8 @@ function connectWebSocket() {
                 
                 // Показываем уведомление
                 showNotification(`Бронь #${message.booking_id}: ${message.action}`, message.status);
+            } else if (message.type === 'broadcast_progress') {
+                showBroadcastProgress(message);
             }
         } catch (e) {
             console.error('Error processing WebSocket message:', e);
@@ -83,6 +85,39 @@ function showNotification(title, status) {
     setTimeout(() => notification.remove(), 3000);
 }
 
+// Прогресс рассылки (события приходят не чаще раза в 500 мс)
+function showBroadcastProgress(progress) {
+    let panel = document.getElementById('broadcast-progress');
+    if (!panel) {
+        panel = document.createElement('div');
+        panel.id = 'broadcast-progress';
+        panel.className = 'notification';
+        panel.style.cssText = `
+            position: fixed;
+            bottom: 20px;
+            right: 20px;
+            padding: 16px 24px;
+            background: var(--gold);
+            color: white;
+            border-radius: 12px;
+            z-index: 10000;
+            box-shadow: 0 4px 20px rgba(0,0,0,0.3);
+        `;
+        document.body.appendChild(panel);
+    }
+
+    const done = progress.status === 'done';
+    panel.style.background = done ? 'var(--success)' : 'var(--gold)';
+    panel.innerHTML = `
+        <strong>Рассылка #${progress.job_id}${done ? ' завершена' : ''}</strong><br>
+        📤 ${progress.sent} · ❌ ${progress.failed} · ⏳ ${progress.remaining}
+        ${done ? '' : ` · ${progress.rate} msg/s`}
+    `;
+    if (done) {
+        setTimeout(() => panel.remove(), 10000);
+    }
+}
+
 // Загрузка дашборда
 async function loadDashboard() {
     try {
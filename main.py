@@ -2,7 +2,7 @@ import asyncio
 import os
 import sys
 
-from aiogram import Bot
+from app.bot.dispatcher import close_bot, get_bot
 from app.config import get_settings
 from app.run_bot import run_polling, set_webhook, remove_webhook
 
@@ -16,7 +16,7 @@ async def run_webhook() -> None:
         print("[MAIN] CRITICAL: BOT_TOKEN not set!", flush=True)
         return
     
-    bot = Bot(token=settings.bot_token)
+    bot = get_bot()
     
     webapp_url = os.getenv("WEBAPP_URL", "http://localhost:8000")
     webhook_url = f"{webapp_url}/api/telegram/webhook"
@@ -34,7 +34,7 @@ async def run_webhook() -> None:
         import traceback
         traceback.print_exc()
     finally:
-        await bot.session.close()
+        await close_bot()
 
 
 if __name__ == "__main__":
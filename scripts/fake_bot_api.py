@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Локальная заглушка Telegram Bot API для замеров без реального Telegram.
+
+Отвечает на sendMessage/sendPhoto/copyMessage/forwardMessage и прочие методы,
+умеет добавлять задержку и отвечать ошибками 429 и 403 с заданной вероятностью.
+
+Запуск отдельно:
+    python scripts/fake_bot_api.py --port 8081 --latency-ms 50 --rate-429 0.01
+Бот подключается к ней через TelegramAPIServer.from_base("http://127.0.0.1:8081").
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        rate_429: float = 0.0,
+        rate_403: float = 0.0,
+        retry_after: int = 1,
+        seed: int | None = None,
+    ) -> None:
+        self.latency = latency_ms / 1000
+        self.rate_429 = rate_429
+        self.rate_403 = rate_403
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.message_ids = itertools.count(1)
+        self.calls: dict[str, int] = {}
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner: web.AppRunner | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запустить сервер; возвращает базовый URL."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = await request.post()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        roll = self.random.random()
+        if roll < self.rate_429:
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        if roll < self.rate_429 + self.rate_403 and "chat_id" in params:
+            return web.json_response({
+                "ok": False,
+                "error_code": 403,
+                "description": "Forbidden: bot was blocked by the user",
+            }, status=403)
+        return web.json_response({"ok": True, "result": self._result(method, params)})
+
+    def _result(self, method: str, params) -> object:
+        if method == "copyMessage":
+            return {"message_id": next(self.message_ids)}
+        if method.startswith(("send", "forward")):
+            chat_id = params.get("chat_id", "0")
+            message = {
+                "message_id": next(self.message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id) if chat_id.lstrip("-").isdigit() else 0, "type": "private"},
+            }
+            if method == "sendPhoto":
+                file_id = f"fake-photo-{message['message_id']}"
+                message["photo"] = [{"file_id": file_id, "file_unique_id": file_id, "width": 800, "height": 600}]
+            else:
+                message["text"] = params.get("text", "")
+            return message
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        return True
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = FakeBotAPI(args.latency_ms, args.rate_429, args.rate_403, args.retry_after)
+    url = await server.start(port=args.port)
+    print(f"🧪 Fake Bot API: {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Заглушка Telegram Bot API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--rate-403", type=float, default=0.0, help="доля ответов 403")
+    parser.add_argument("--retry-after", type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
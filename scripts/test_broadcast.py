@@ -30,8 +30,7 @@ async def test_broadcast():
     
     async with session_factory() as session:
         # Получаем подписчиков
-        subscribers = await crud.get_active_subscribers(session)
-        count = len(subscribers)
+        count = await crud.get_subscribers_count(session)
         
         if count == 0:
             print("❌ Нет активных подписчиков")
@@ -53,24 +52,25 @@ async def test_broadcast():
         failed = 0
         
         print()
-        for sub in subscribers:
-            try:
-                await bot.send_message(
-                    chat_id=sub.telegram_id,
-                    text="🧪 <b>Тестовая рассылка</b>\n\n"
-                         "Это тестовое сообщение для проверки функционала рассылки.\n\n"
-                         "✅ Если вы видите это сообщение - рассылка работает!",
-                    parse_mode="HTML"
-                )
-                await crud.update_last_mailed(session, sub.telegram_id)
-                success += 1
-                print(f"✅ Отправлено: {sub.telegram_id}")
-            except Exception as e:
-                failed += 1
-                print(f"❌ Ошибка ({sub.telegram_id}): {e}")
-            
-            # Anti-flood
-            await asyncio.sleep(0.05)
+        async for page in crud.iter_active_subscribers(session):
+            for _, telegram_id in page:
+                try:
+                    await bot.send_message(
+                        chat_id=telegram_id,
+                        text="🧪 <b>Тестовая рассылка</b>\n\n"
+                             "Это тестовое сообщение для проверки функционала рассылки.\n\n"
+                             "✅ Если вы видите это сообщение - рассылка работает!",
+                        parse_mode="HTML"
+                    )
+                    await crud.update_last_mailed(session, telegram_id)
+                    success += 1
+                    print(f"✅ Отправлено: {telegram_id}")
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Ошибка ({telegram_id}): {e}")
+
+                # Anti-flood
+                await asyncio.sleep(0.05)
         
         await bot.session.close()
         
@@ -0,0 +1,193 @@
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from app.bot.broadcast import BroadcastEngine
+
+
+def test_engine_counts_sent_and_failed() -> None:
+    async def send(chat_id: int) -> None:
+        if chat_id % 5 == 0:
+            raise RuntimeError("blocked")
+
+    engine = BroadcastEngine(concurrency=4)
+    result = asyncio.run(engine.run(range(1, 21), send))
+    assert result.sent == 16
+    assert result.failed == 4
+
+
+def test_engine_sends_concurrently() -> None:
+    async def send(chat_id: int) -> None:
+        await asyncio.sleep(0.05)
+
+    engine = BroadcastEngine(concurrency=10)
+    started = time.monotonic()
+    asyncio.run(engine.run(range(20), send))
+    assert time.monotonic() - started < 0.5
+
+
+def test_engine_reports_unreachable_and_retries_flood_control() -> None:
+    method = SendMessage(chat_id=1, text="hi")
+    attempts: dict[int, int] = {}
+
+    async def send(chat_id: int) -> None:
+        attempts[chat_id] = attempts.get(chat_id, 0) + 1
+        if chat_id == 2:
+            raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+        if chat_id == 3 and attempts[chat_id] == 1:
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0)
+
+    engine = BroadcastEngine(concurrency=2)
+    result = asyncio.run(engine.run([1, 2, 3], send))
+    assert result.sent == 2
+    assert result.unreachable == [2]
+    assert attempts[3] == 2
+
+
+def test_worker_stopped_mid_chunk_resumes_without_losing_recipients(tmp_path) -> None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.bot.broadcast_worker import BroadcastWorker
+    from app.db import crud
+    from app.db.base import Base
+
+    delivered: list[int] = []
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'filin.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            async with factory() as session:
+                for telegram_id in range(1, 41):
+                    await crud.add_subscriber(session, telegram_id)
+                job = await crud.create_broadcast_job(session, text="hi")
+
+            first = BroadcastWorker(None, factory)
+
+            async def send_then_stop(chat_id: int) -> None:
+                await asyncio.sleep(0.01)
+                delivered.append(chat_id)
+                if len(delivered) == 8:
+                    first._stopping = True  # Остановка посреди порции
+
+            first._make_sender = lambda job: send_then_stop
+            async with factory() as session:
+                await first.process(await crud.claim_broadcast_job(session, first.worker_id, first.stale_after))
+                released = await crud.get_broadcast_job(session, job.id)
+                released_state = (released.status, released.sent, len(delivered))
+
+            second = BroadcastWorker(None, factory)
+
+            async def send(chat_id: int) -> None:
+                delivered.append(chat_id)
+
+            second._make_sender = lambda job: send
+            async with factory() as session:
+                await second.process(await crud.claim_broadcast_job(session, second.worker_id, second.stale_after))
+                return released_state, await crud.get_broadcast_job(session, job.id)
+        finally:
+            await engine.dispose()
+
+    (status, sent_before_resume, delivered_before_resume), finished = asyncio.run(scenario())
+
+    assert status == "queued"
+    assert 8 <= sent_before_resume == delivered_before_resume < 40  # Отправки до остановки учтены
+    assert sorted(delivered) == list(range(1, 41))
+    assert (finished.status, finished.sent) == ("done", 40)
+
+
+def test_worker_cancelled_mid_chunk_records_failed_and_unreachable(tmp_path) -> None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.bot.broadcast_worker import BroadcastWorker
+    from app.db import crud
+    from app.db.base import Base
+
+    method = SendMessage(chat_id=1, text="hi")
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'filin.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            async with factory() as session:
+                for telegram_id in range(1, 11):
+                    await crud.add_subscriber(session, telegram_id)
+                job = await crud.create_broadcast_job(session, text="hi")
+
+            worker = BroadcastWorker(None, factory)
+            hanging = asyncio.Event()
+
+            async def send(chat_id: int) -> None:
+                if chat_id == 2:
+                    raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+                if chat_id == 3:
+                    raise RuntimeError("boom")
+                if chat_id >= 5:
+                    hanging.set()
+                    await asyncio.sleep(60)  # stop() не дождётся этих отправок
+
+            worker._make_sender = lambda job: send
+            async with factory() as session:
+                claimed = await crud.claim_broadcast_job(session, worker.worker_id, worker.stale_after)
+            task = asyncio.create_task(worker.process(claimed))
+            await hanging.wait()
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+            async with factory() as session:
+                released = await crud.get_broadcast_job(session, job.id)
+                return released.status, released.sent, released.failed, await crud.get_subscribers_count(session)
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(scenario()) == ("queued", 2, 2, 9)
+
+
+def test_recorder_exit_during_periodic_flush_keeps_the_batch() -> None:
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.bot.broadcast import DeliveryRecorder
+    from app.db import crud
+    from app.db.base import Base
+    from app.db.models import Subscriber
+
+    class Hang:
+        async def __aenter__(self):
+            await asyncio.sleep(60)
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with factory() as session:
+            await crud.add_subscriber(session, 1)
+
+        calls = 0
+
+        def slow_first_factory():
+            nonlocal calls
+            calls += 1
+            return Hang() if calls == 1 else factory()
+
+        async with DeliveryRecorder(slow_first_factory, batch_size=100, interval_ms=10) as recorder:
+            await recorder.add(1)
+            await asyncio.sleep(0.05)  # Периодический сброс завис в записи
+        try:
+            async with factory() as session:
+                return await session.scalar(select(Subscriber.last_mailed_at).where(Subscriber.telegram_id == 1))
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(scenario()) is not None
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from app.cache import TTLCache
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" становится самым старым
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats.evictions == 1
+
+
+def test_cache_respects_byte_limit() -> None:
+    cache = TTLCache(ttl=60, max_entries=100, max_bytes=100, sizeof=len)
+    cache.set("a", "x" * 60)
+    cache.set("b", "y" * 60)
+
+    assert "a" not in cache and "b" in cache
+    assert cache.size_bytes == 60
+
+    cache.set("huge", "z" * 200)  # Больше всего кэша — не сохраняется
+    assert "huge" not in cache and "b" in cache
+
+
+def test_cache_expires_and_sweeps() -> None:
+    cache = TTLCache(ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    time.sleep(0.06)
+
+    assert cache.sweep() == 1
+    assert len(cache) == 1
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.snapshot()["hits"] == 1 and cache.snapshot()["misses"] == 1
+
+
+def test_get_or_load_coalesces_concurrent_misses() -> None:
+    async def scenario() -> tuple[list, int]:
+        cache = TTLCache(ttl=60)
+        calls = 0
+
+        async def loader() -> str:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "payload"
+
+        results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(20)))
+        return results, calls
+
+    results, calls = asyncio.run(scenario())
+    assert results == ["payload"] * 20
+    assert calls == 1
+
+
+def test_get_or_load_serves_stale_while_refreshing() -> None:
+    async def scenario() -> tuple[str, str]:
+        cache = TTLCache(ttl=0.01, stale_ttl=60)
+        cache.set("k", "old")
+        await asyncio.sleep(0.02)
+
+        async def loader() -> str:
+            return "new"
+
+        stale = await cache.get_or_load("k", loader)
+        await asyncio.sleep(0)  # Даём фоновому обновлению завершиться
+        return stale, await cache.get_or_load("k", loader)
+
+    assert asyncio.run(scenario()) == ("old", "new")
+
+
+def test_invalidation_discards_inflight_load() -> None:
+    async def scenario() -> str | None:
+        cache = TTLCache(ttl=60)
+
+        async def loader() -> str:
+            await asyncio.sleep(0.01)
+            return "stale"
+
+        load = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        cache.invalidate("k")
+        await load
+        return cache.get("k")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_invalidation_keeps_other_keys_loading() -> None:
+    async def scenario() -> tuple[str | None, str | None]:
+        cache = TTLCache(ttl=60)
+
+        async def loader() -> str:
+            await asyncio.sleep(0.01)
+            return "value"
+
+        loads = [asyncio.create_task(cache.get_or_load(key, loader)) for key in ("a", "b")]
+        await asyncio.sleep(0)
+        cache.invalidate("a")
+        await asyncio.gather(*loads)
+        return cache.get("a"), cache.get("b")
+
+    assert asyncio.run(scenario()) == (None, "value")
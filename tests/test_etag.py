@@ -0,0 +1,30 @@
+from starlette.requests import Request
+
+from app.webapp.etag import conditional_json, make_etag
+
+
+def make_request(if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_conditional_json_returns_304_without_building_body() -> None:
+    etag = make_etag("bootstrap", 1, 42)
+
+    def body() -> bytes:
+        raise AssertionError("тело не должно собираться")
+
+    response = conditional_json(make_request(f'"x", {etag}'), etag, body)
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_conditional_json_returns_body_for_new_version() -> None:
+    old = make_etag("bootstrap", 1, 42)
+    new = make_etag("bootstrap", 2, 42)
+    assert old != new
+
+    response = conditional_json(make_request(old), new, lambda: b'{"ok": true}')
+    assert response.status_code == 200
+    assert response.body == b'{"ok": true}'
+    assert response.headers["cache-control"] == "private, no-cache"
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import Message, Update
+
+from app.bot.middleware.handler_metrics import setup_handler_metrics
+from app.metrics import get_metrics
+
+
+def _message_update(update_id: int, text: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "A"},
+            "text": text,
+        },
+    })
+
+
+def test_handler_metrics_record_latency_calls_and_errors() -> None:
+    router = Router(name="demo")
+
+    @router.message(F.text == "ok")
+    async def ok_handler(message: Message) -> None:
+        await asyncio.sleep(0.01)
+
+    @router.message(F.text == "fail")
+    async def failing_handler(message: Message) -> None:
+        raise RuntimeError("boom")
+
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    setup_handler_metrics(dispatcher)
+    metrics = get_metrics()
+    metrics.reset()
+
+    async def scenario():
+        bot = Bot("123456:AAAbbbCCC")
+        await dispatcher.feed_update(bot, _message_update(1, "ok"))
+        with pytest.raises(RuntimeError):
+            await dispatcher.feed_update(bot, _message_update(2, "fail"))
+        await dispatcher.feed_update(bot, _message_update(3, "nobody listens"))
+        await bot.session.close()
+
+    asyncio.run(scenario())
+    snapshot = metrics.snapshot()
+
+    assert snapshot["histograms"]["bot.handler_ms[demo.ok_handler]"]["max"] >= 10
+    assert snapshot["counters"]["bot.handler_calls[demo.failing_handler]"] == 1
+    assert snapshot["counters"]["bot.handler_errors[demo.failing_handler]"] == 1
+    assert snapshot["counters"]["bot.updates[message]"] == 3
+    assert snapshot["counters"]["bot.update_errors[message]"] == 1
+    assert snapshot["counters"]["bot.updates_unhandled[message]"] == 1
+    assert snapshot["histograms"]["bot.middleware_wait_ms[message]"]["count"] == 2
+    assert snapshot["gauges"]["bot.updates_in_flight"] == 0
+    assert snapshot["gauges"]["bot.handlers_in_flight[demo.ok_handler]"] == 0
@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendPhoto
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.bot.media_cache import CachedPhoto
+from app.db import crud
+from app.db.base import Base
+
+URL = "https://example.com/promo.jpg"
+
+
+def run_with_factory(scenario):
+    async def runner():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            return await scenario(async_sessionmaker(engine, expire_on_commit=False))
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(runner())
+
+
+def fake_telegram(valid_ids: set[str], uploads: list[str]):
+    """send_photo: URL «загружается» и получает новый file_id, неизвестный file_id отклоняется."""
+
+    async def send_photo(photo: str):
+        await asyncio.sleep(0)
+        if photo == URL:
+            uploads.append(photo)
+            valid_ids.add(f"id{len(uploads)}")
+            return SimpleNamespace(photo=[SimpleNamespace(file_id=f"id{len(uploads)}")])
+        if photo not in valid_ids:
+            raise TelegramBadRequest(
+                method=SendPhoto(chat_id=1, photo=photo),
+                message="Bad Request: wrong file identifier/HTTP URL specified",
+            )
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=photo)])
+
+    return send_photo
+
+
+def test_photo_is_uploaded_once_and_reused_from_cache() -> None:
+    async def scenario(factory):
+        uploads: list[str] = []
+        send_photo = fake_telegram(set(), uploads)
+        photo = CachedPhoto(factory, URL)
+        await asyncio.gather(*(photo.send(send_photo) for _ in range(5)))
+
+        await CachedPhoto(factory, URL).send(send_photo)  # Следующая рассылка
+        return uploads
+
+    assert run_with_factory(scenario) == [URL]
+
+
+def test_rejected_cached_file_id_falls_back_to_url_once() -> None:
+    async def scenario(factory):
+        async with factory() as session:
+            await crud.save_cached_file_id(session, URL, "stale")
+        uploads: list[str] = []
+        send_photo = fake_telegram(set(), uploads)
+        photo = CachedPhoto(factory, URL)
+
+        sent = await asyncio.gather(*(photo.send(send_photo) for _ in range(5)))
+        async with factory() as session:
+            cached = await crud.get_cached_file_id(session, URL)
+        return len(sent), uploads, cached
+
+    sent, uploads, cached = run_with_factory(scenario)
+    assert sent == 5
+    assert uploads == [URL]
+    assert cached == "id1"
@@ -0,0 +1,42 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db import crud
+from app.db.base import Base
+from app.db.instrumentation import instrument_engine, track_statements
+from app.metrics import Histogram, get_metrics
+
+
+def test_histogram_quantiles_use_bucket_bounds() -> None:
+    histogram = Histogram(buckets=(1, 10, 100))
+    for value in [0.5] * 90 + [50] * 9 + [500]:
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["p50"] == 1
+    assert snapshot["p99"] == 100
+    assert snapshot["max"] == 500
+
+
+def test_statements_are_counted_per_scope_and_call_site() -> None:
+    async def scenario() -> int:
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        instrument_engine(engine, slow_query_ms=10_000)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with async_sessionmaker(engine)() as session:
+                with track_statements("test") as counter:
+                    await crud.get_subscribers_count(session)
+                    await crud.get_active_promotions(session)
+            return counter.count
+        finally:
+            await engine.dispose()
+
+    get_metrics().reset()
+    assert asyncio.run(scenario()) == 2
+    histograms = get_metrics().snapshot()["histograms"]
+    assert histograms["db.query_ms[app.db.crud:get_subscribers_count]"]["count"] == 1
+    assert histograms["db.statements_per_test"]["count"] == 1
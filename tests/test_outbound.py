@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+from app.bot.outbound import ChatRateLimiter, Priority, PriorityTokenBucket
+
+
+def test_token_bucket_limits_rate() -> None:
+    async def consume() -> None:
+        bucket = PriorityTokenBucket(rate=50)
+        for _ in range(11):
+            await bucket.acquire()
+
+    started = time.monotonic()
+    asyncio.run(consume())
+    assert time.monotonic() - started >= 0.19
+
+
+def test_token_bucket_serves_interactive_before_bulk() -> None:
+    async def scenario() -> list[str]:
+        bucket = PriorityTokenBucket(rate=20)
+        await bucket.acquire()  # Забираем стартовый токен, дальше все ждут
+        order: list[str] = []
+
+        async def take(name: str, priority: Priority) -> None:
+            await bucket.acquire(priority)
+            order.append(name)
+
+        bulk = [asyncio.create_task(take(f"bulk{i}", Priority.BULK)) for i in range(3)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(take("reply", Priority.INTERACTIVE))
+        await asyncio.gather(*bulk, interactive)
+        return order
+
+    assert asyncio.run(scenario())[0] == "reply"
+
+
+def test_chat_limiter_allows_burst_then_spaces_messages() -> None:
+    limiter = ChatRateLimiter(rate=1.0, burst=2)
+    assert limiter.reserve(1) == 0
+    assert limiter.reserve(1) == 0
+    assert 0.9 < limiter.reserve(1) <= 1.0
+    assert limiter.reserve(2) == 0
+
+
+def test_token_bucket_close_stops_dispatcher() -> None:
+    async def scenario() -> tuple[bool, bool, int]:
+        bucket = PriorityTokenBucket(rate=0.1)
+        await bucket.acquire()
+        waiter = asyncio.create_task(bucket.acquire(Priority.BULK))
+        await asyncio.sleep(0)
+        dispatcher = bucket._dispatcher
+        await bucket.close()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return dispatcher.cancelled(), waiter.cancelled(), bucket.waiting
+
+    assert asyncio.run(scenario()) == (True, True, 0)
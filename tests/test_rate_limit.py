@@ -0,0 +1,46 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.bot.middleware.rate_limit import MemoryRateLimitBackend, RateLimit, RateLimitMiddleware
+
+
+def test_memory_backend_refills_and_evicts_idle_buckets() -> None:
+    async def scenario():
+        backend = MemoryRateLimitBackend()
+        limit = RateLimit(rate=20, burst=2)
+        burst = [await backend.consume("u1", limit) for _ in range(3)]
+        time.sleep(0.06)  # Восстановился один токен
+        refilled = await backend.consume("u1", limit)
+        time.sleep(0.11)  # Бакет u1 полностью восстановился — удаляется при следующем вызове
+        await backend.consume("u2", limit)
+        return burst, refilled, len(backend)
+
+    burst, refilled, tracked = asyncio.run(scenario())
+
+    assert burst == [True, True, False]
+    assert refilled is True
+    assert tracked == 1
+
+
+def test_middleware_limits_per_update_type_and_peek_does_not_consume() -> None:
+    limiter = RateLimitMiddleware({"message": RateLimit(rate=0.1, burst=1)})
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+
+    def data(update_type: str) -> dict:
+        return {"event_from_user": SimpleNamespace(id=1), "event_update": SimpleNamespace(event_type=update_type)}
+
+    async def scenario():
+        peeked = await limiter.would_limit("message", 1)
+        for i in range(2):
+            await limiter(handler, f"message{i}", data("message"))
+        await limiter(handler, "callback", data("callback_query"))  # Без лимита
+        return peeked, await limiter.would_limit("message", 1)
+
+    before, after = asyncio.run(scenario())
+
+    assert (before, after) == (False, True)
+    assert handled == ["message0", "callback"]
@@ -0,0 +1,87 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.config import get_settings
+from app.db import crud
+from app.db import sqlite
+from app.db.base import Base
+from app.db.models import Subscriber
+from app.db.sqlite import SQLiteSession, install_pragmas
+
+
+def test_concurrent_writers_on_small_pool(tmp_path) -> None:
+    async def scenario() -> tuple[str, int]:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'filin.db'}", pool_size=2, max_overflow=2)
+        install_pragmas(engine, get_settings())
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+
+        async def onboard(telegram_id: int) -> None:
+            async with factory() as session:
+                await crud.onboard_user(session, telegram_id, f"user{telegram_id}", None)
+                await crud.add_promotion(session, f"promo{telegram_id}", "...")
+
+        try:
+            await asyncio.gather(*(onboard(i) for i in range(1, 51)))
+            async with factory() as session:
+                journal_mode = (await session.execute(text("PRAGMA journal_mode"))).scalar()
+                return journal_mode, await crud.get_subscribers_count(session)
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(scenario()) == ("wal", 50)
+
+
+def _factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'filin.db'}", pool_size=2, max_overflow=2)
+    install_pragmas(engine, get_settings())
+    return engine, async_sessionmaker(engine, class_=SQLiteSession, expire_on_commit=False)
+
+
+def test_autoflush_takes_write_lock(tmp_path) -> None:
+    async def scenario() -> tuple[bool, bool]:
+        engine, factory = _factory(tmp_path)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with factory() as session:
+                for telegram_id in (1, 2):
+                    await crud.add_subscriber(session, telegram_id)
+            async with factory() as session:
+                subscriber = await session.scalar(select(Subscriber).where(Subscriber.telegram_id == 1))
+                subscriber.is_active = False
+                await session.get(Subscriber, 10**6)  # Промах identity map -> SELECT -> autoflush
+                during = sqlite._write_lock.locked()
+                await session.commit()
+                return during, sqlite._write_lock.locked()
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def test_second_writer_in_same_task_times_out(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(sqlite, "get_settings", lambda: replace(get_settings(), sqlite_busy_timeout_ms=50))
+    monkeypatch.setattr(sqlite, "_write_lock", asyncio.Lock())  # Прошлые тесты привязали lock к своему loop
+
+    async def scenario() -> bool:
+        engine, factory = _factory(tmp_path)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with factory() as outer, factory() as inner:
+                outer.add(Subscriber(telegram_id=1))
+                await outer.flush()
+                inner.add(Subscriber(telegram_id=2))
+                with pytest.raises(TimeoutError):
+                    await inner.flush()
+            return sqlite._write_lock.locked()
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(scenario()) is False
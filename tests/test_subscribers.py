@@ -0,0 +1,114 @@
+import asyncio
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db import crud
+from app.db.base import Base
+from app.db.models import Subscriber
+
+
+def run_with_session(scenario):
+    async def runner():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            async with factory() as session:
+                return await scenario(session)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(runner())
+
+
+def test_mark_mailed_updates_only_given_subscribers() -> None:
+    async def scenario(session):
+        for telegram_id in (1, 2, 3):
+            await crud.add_subscriber(session, telegram_id)
+        await crud.mark_mailed(session, [1, 3])
+        rows = await session.execute(select(Subscriber.telegram_id, Subscriber.last_mailed_at))
+        return {telegram_id: mailed_at for telegram_id, mailed_at in rows}
+
+    mailed = run_with_session(scenario)
+    assert mailed[1] is not None
+    assert mailed[2] is None
+    assert mailed[3] is not None
+
+
+def test_reserve_deliveries_skips_already_reserved() -> None:
+    async def scenario(session):
+        job = await crud.create_broadcast_job(session, text="hi")
+        first = await crud.reserve_deliveries(session, job.id, [1, 2])
+        second = await crud.reserve_deliveries(session, job.id, [1, 2, 3])
+        return first, second
+
+    first, second = run_with_session(scenario)
+    assert first == [1, 2]
+    assert second == [3]
+
+
+def test_iter_active_subscribers_pages_by_id() -> None:
+    async def scenario(session):
+        for telegram_id in range(1, 8):
+            await crud.add_subscriber(session, telegram_id)
+        await crud.remove_subscriber(session, 4)
+        return [page async for page in crud.iter_active_subscribers(session, batch_size=3)]
+
+    pages = run_with_session(scenario)
+    assert [[telegram_id for _, telegram_id in page] for page in pages] == [[1, 2, 3], [5, 6, 7]]
+
+
+def test_client_upsert_keeps_existing_fields() -> None:
+    async def scenario(session):
+        client = await crud.get_or_create_client(session, 7, "user", None)
+        client.visits = 3
+        await session.commit()
+        updated = await crud.get_or_create_client(session, 7, None, "Full Name")
+        return client.id, updated
+
+    client_id, updated = run_with_session(scenario)
+    assert updated.id == client_id
+    assert (updated.username, updated.full_name, updated.visits) == ("user", "Full Name", 3)
+
+
+def test_client_upsert_commits_only_on_change() -> None:
+    async def scenario(session):
+        commits = []
+        event.listen(session.sync_session, "after_commit", lambda _: commits.append(1))
+        created = await crud.get_or_create_client(session, 8, "owl", "Filin")
+        same = await crud.get_or_create_client(session, 8, "owl", None)
+        empty = await crud.get_or_create_client(session, 8, None, None)
+        renamed = await crud.get_or_create_client(session, 8, "eagle", "Filin")
+        return len(commits), created.id, same.id, empty.id, renamed.username
+
+    commits, created_id, same_id, empty_id, username = run_with_session(scenario)
+    assert commits == 2
+    assert created_id == same_id == empty_id
+    assert username == "eagle"
+
+
+def test_add_subscriber_reactivates_existing() -> None:
+    async def scenario(session):
+        first = await crud.add_subscriber(session, 5)
+        await crud.remove_subscriber(session, 5)
+        again = await crud.add_subscriber(session, 5)
+        count = await crud.get_subscribers_count(session)
+        return first.id, again, count
+
+    first_id, again, count = run_with_session(scenario)
+    assert again.id == first_id and again.is_active
+    assert count == 1
+
+
+def test_onboard_user_skips_writes_when_unchanged() -> None:
+    async def scenario(session):
+        first = await crud.onboard_user(session, 9, "owl", "Filin")
+        repeat = await crud.onboard_user(session, 9, "owl", "Filin")
+        await crud.remove_subscriber(session, 9)
+        resubscribed = await crud.onboard_user(session, 9, "owl", None)
+        client = await crud.get_client_by_telegram_id(session, 9)
+        return first, repeat, resubscribed, client.full_name, await crud.get_subscribers_count(session)
+
+    assert run_with_session(scenario) == (True, False, True, "Filin", 1)
@@ -0,0 +1,30 @@
+from app.bot.update_dedup import UpdateDeduplicator
+
+
+def test_dedup_drops_repeats_within_capacity() -> None:
+    dedup = UpdateDeduplicator(capacity=3)
+    assert [dedup.check_and_remember(i) for i in (1, 2, 1, 3)] == [False, False, True, False]
+
+    dedup.check_and_remember(4)  # Вытесняет 1
+    assert len(dedup) == 3
+    assert not dedup.check_and_remember(1)
+    assert dedup.duplicates == 1
+
+
+def test_forgotten_update_is_accepted_again() -> None:
+    dedup = UpdateDeduplicator()
+    dedup.check_and_remember(10)
+    dedup.forget(10)
+    assert not dedup.check_and_remember(10)
+    assert dedup.check_and_remember(10)
+
+
+def test_forgotten_update_keeps_its_place_after_being_remembered_again() -> None:
+    dedup = UpdateDeduplicator(capacity=3)
+    dedup.check_and_remember(10)
+    dedup.forget(10)
+    for update_id in (10, 11, 12):
+        dedup.check_and_remember(update_id)
+
+    assert dedup.check_and_remember(10)  # Всё ещё среди последних трёх
+    assert len(dedup) == 3
@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+from app import venue
+from app.db import crud
+from tests.test_subscribers import run_with_session
+
+
+def test_merge_snapshot_appends_user_fields() -> None:
+    snapshot = json.dumps({"contacts": "📞", "promotions": []}, ensure_ascii=False).encode()
+    merged = json.loads(venue.merge_snapshot(snapshot, {"visits": 3, "notes": None}))
+    assert merged == {"contacts": "📞", "promotions": [], "visits": 3, "notes": None}
+
+
+def test_venue_writes_invalidate_snapshot() -> None:
+    async def scenario(session):
+        loads = 0
+
+        async def loader() -> bytes:
+            nonlocal loads
+            loads += 1
+            return b'{"contacts": "%d"}' % loads
+
+        assert (await venue.get_venue_snapshot(loader)).body == b'{"contacts": "1"}'
+        assert (await venue.get_venue_snapshot(loader)).body == b'{"contacts": "1"}'
+
+        version = venue.venue_version()
+        await crud.update_contacts(session, "new", ("schedule", "contacts"))
+        assert (await venue.get_venue_snapshot(loader)).body == b'{"contacts": "2"}'
+
+        await crud.add_promotion(session, "Акция", "Описание")
+        assert venue.venue_version() > version
+        assert (await venue.get_venue_snapshot(loader)).body == b'{"contacts": "3"}'
+
+    run_with_session(scenario)
+
+
+def test_slow_load_started_before_write_keeps_its_own_version() -> None:
+    async def scenario():
+        release_old = asyncio.Event()
+
+        async def old_loader() -> bytes:
+            await release_old.wait()
+            return b'{"contacts": "old"}'
+
+        async def new_loader() -> bytes:
+            return b'{"contacts": "new"}'
+
+        venue.invalidate_venue_snapshot()  # Снапшот от предыдущих тестов
+        old_task = asyncio.create_task(venue.get_venue_snapshot(old_loader))
+        await asyncio.sleep(0)
+        venue.invalidate_venue_snapshot()
+        new = await venue.get_venue_snapshot(new_loader)
+        release_old.set()
+        old = await old_task  # Завершилась последней
+        cached = await venue.get_venue_snapshot(old_loader)
+        return old, new, cached
+
+    old, new, cached = asyncio.run(scenario())
+    assert old.body == b'{"contacts": "old"}'
+    assert cached == new
+    assert old.version != new.version
@@ -0,0 +1,24 @@
+from app.bot.webhook_filter import parse_webhook, secret_matches
+
+
+def test_parse_webhook_extracts_type_and_sender() -> None:
+    body = b'{"update_id": 7, "callback_query": {"id": "1", "from": {"id": 42, "is_bot": false, "first_name": "A"}}}'
+
+    envelope = parse_webhook(body)
+
+    assert envelope is not None
+    assert (envelope.update_id, envelope.update_type, envelope.sender_id) == (7, "callback_query", 42)
+
+
+def test_parse_webhook_rejects_non_updates() -> None:
+    assert parse_webhook(b"not json") is None
+    assert parse_webhook(b"[1, 2]") is None
+    assert parse_webhook(b'{"message": {}}') is None
+    assert parse_webhook(b'{"update_id": "7"}') is None
+
+
+def test_secret_matches() -> None:
+    assert secret_matches(None, "")
+    assert secret_matches("abc", "abc")
+    assert not secret_matches("abd", "abc")
+    assert not secret_matches(None, "abc")
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from aiogram.types import Update
+
+from app.bot.webhook_queue import WebhookQueue
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "text": str(update_id),
+        },
+    })
+
+
+class SlowDispatcher:
+    def __init__(self) -> None:
+        self.processed: list[tuple[int, int]] = []
+
+    async def feed_update(self, bot, update: Update) -> None:
+        await asyncio.sleep(0.05)
+        self.processed.append((update.message.chat.id, update.update_id))
+
+
+def test_queue_keeps_chat_order_and_runs_chats_in_parallel() -> None:
+    async def scenario() -> tuple[list, float]:
+        dispatcher = SlowDispatcher()
+        queue = WebhookQueue(bot=None, dispatcher=dispatcher, workers=4)
+        queue.start()
+        started = time.monotonic()
+        for update_id in range(1, 13):
+            assert queue.enqueue(make_update(update_id, chat_id=update_id % 4))
+        await queue.stop()
+        return dispatcher.processed, time.monotonic() - started
+
+    processed, elapsed = asyncio.run(scenario())
+    assert len(processed) == 12
+    for chat_id in range(4):
+        ids = [update_id for chat, update_id in processed if chat == chat_id]
+        assert ids == sorted(ids)
+    assert elapsed < 0.4  # 4 чата параллельно: ~3 × 50 мс, а не 12 × 50 мс
+
+
+def test_enqueue_reports_full_shard() -> None:
+    queue = WebhookQueue(bot=None, dispatcher=SlowDispatcher(), workers=1, max_depth=2)
+    assert queue.enqueue(make_update(1, chat_id=1))
+    assert queue.enqueue(make_update(2, chat_id=1))
+    assert not queue.enqueue(make_update(3, chat_id=1))
@@ -0,0 +1,78 @@
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db import crud
+from app.db.base import Base
+from app.db.models import Client
+from app.db.write_behind import ProfileWriteBehind, start_profile_writer, stop_profile_writer
+
+
+def test_profile_refresh_is_deferred_until_flush() -> None:
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        start_profile_writer(factory, interval=60)
+        try:
+            async with factory() as session:
+                await crud.ensure_client(session, 1, "old", "Old Name")
+                await crud.ensure_client(session, 1, "new", None)
+                await crud.ensure_client(session, 1, "newest", None)
+                before = await session.scalar(select(Client.username).where(Client.telegram_id == 1))
+
+            await stop_profile_writer()  # Сбрасывает буфер
+            async with factory() as session:
+                after = (await session.execute(
+                    select(Client.username, Client.full_name).where(Client.telegram_id == 1)
+                )).one()
+            return before, tuple(after)
+        finally:
+            await stop_profile_writer()
+            await engine.dispose()
+
+    before, after = asyncio.run(scenario())
+    assert before == "old"
+    assert after == ("newest", "Old Name")
+
+
+def test_stop_during_periodic_flush_keeps_the_batch() -> None:
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with factory() as session:
+            await crud.ensure_client(session, 1, "old", None)
+
+        calls = 0
+
+        def slow_first_factory():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                return _Hang()  # Периодическая запись ещё идёт, когда приходит stop()
+            return factory()
+
+        writer = ProfileWriteBehind(slow_first_factory, interval=0.01)
+        writer.queue(1, "new", None)
+        writer.start()
+        await asyncio.sleep(0.05)
+        await writer.stop()
+        try:
+            async with factory() as session:
+                return await session.scalar(select(Client.username).where(Client.telegram_id == 1))
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(scenario()) == "new"
+
+
+class _Hang:
+    async def __aenter__(self):
+        await asyncio.sleep(60)
+
+    async def __aexit__(self, *exc_info):
+        return False